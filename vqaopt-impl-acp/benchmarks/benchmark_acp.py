@@ -0,0 +1,299 @@
+"""
+Benchmark the stages of the ACP pipeline on the bundled instances.
+
+Every combination of instance, horizon and rule thresholds is loaded stage by
+stage: legs (`load_raw_data`), duties (`DutyGenerator`), pairings
+(`PairingGenerator`), the exact cover matrix (`ACP2MCEC.reduce`) and the cost
+of bitstrings (`cost_of_bitstring`). The wall time, the peak memory and the
+size of the output of each stage are written to a JSON file, which can be
+compared against a saved baseline:
+
+    python benchmarks/benchmark_acp.py --instances instance_1 --days 1 3 \\
+        --grid MinRest.threshold=9.5,12 --output results.json
+
+    python benchmarks/benchmark_acp.py ... --baseline results.json
+
+The comparison reports the stages that got slower or used more memory than
+the tolerance allows, and the outputs whose sizes changed, and exits with
+status 1 if there are any.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import typing
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from vqaopt.impl.acp import ACPProblem
+from vqaopt.impl.acp.cost_model import ACPCostExample
+from vqaopt.impl.acp.data_model import DutyGraph, PairingPool
+from vqaopt.impl.acp.data_model.duty_generation import DutyGenerator
+from vqaopt.impl.acp.data_model.pairing_generation import PairingGenerator
+from vqaopt.impl.acp.loader import LoadACP
+from vqaopt.impl.acp.reduction import ACP2MCEC
+from vqaopt.impl.acp.rule import rules
+
+INSTANCES = [f"instance_{i}" for i in range(1, 8)]
+DUTY_RULES = ["MaxFlights", "MinConnect", "MaxDurationDutyTime"]
+PAIRING_RULES = ["MaxDuties", "MinRest", "MaxPairingDuration"]
+
+# Stages faster than this are too noisy to flag.
+MIN_TIME = 0.05
+
+
+def _measure(
+    stage: typing.Callable[[], typing.Any], repeat: int, memory: bool
+) -> tuple[typing.Any, dict[str, float]]:
+    # Keeps the best time of `repeat` runs, then runs the stage again under
+    # tracemalloc for its peak memory, which would slow down the timed runs.
+    best = float("inf")
+    for _ in range(repeat):
+        value = None
+        start = time.perf_counter()
+        value = stage()
+        best = min(best, time.perf_counter() - start)
+    measurement = {"time": best}
+    if memory:
+        value = None
+        tracemalloc.start()
+        try:
+            value = stage()
+            measurement["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return value, measurement
+
+
+def parse_grid(specs: typing.Sequence[str]) -> list[dict[str, float]]:
+    """
+    Returns every combination of the rule thresholds given as
+    `Rule.field=value,value,...`.
+    """
+
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        rule, _, field = name.partition(".")
+        if rule not in DUTY_RULES + PAIRING_RULES or not field or not values:
+            raise ValueError(f"invalid grid axis {spec!r}")
+        axes.append([(name, float(value)) for value in values.split(",")])
+    return [dict(combination) for combination in itertools.product(*axes)]
+
+
+def make_rules(params: dict[str, float], names: list[str]) -> set:
+    """
+    Returns the rules of `names` with the thresholds of `params`.
+    """
+
+    made = set()
+    for name in names:
+        cls = getattr(rules, name)
+        fields = {
+            key.partition(".")[2]: value
+            for key, value in params.items()
+            if key.partition(".")[0] == name
+        }
+        made.add(
+            cls(
+                **{
+                    field: type(cls.model_fields[field].default)(value)
+                    for field, value in fields.items()
+                }
+            )
+        )
+    return made
+
+
+def run_case(
+    input_dir: Path,
+    instance: str,
+    days: int,
+    params: dict[str, float],
+    bitstrings: int,
+    repeat: int,
+    memory: bool,
+    sparse: bool,
+) -> dict[str, typing.Any]:
+    """
+    Runs the stages on one instance and returns their measurements.
+    """
+
+    loader = LoadACP(
+        input_dir_location=str(input_dir),
+        instance=instance,
+        days=days,
+        cache=False,
+        cost_model=ACPCostExample(),
+        duty_rules=make_rules(params, DUTY_RULES),
+        pairing_rules=make_rules(params, PAIRING_RULES),
+    )
+    stages: dict[str, dict[str, float]] = {}
+
+    legs, stages["legs"] = _measure(loader.load_raw_data, repeat, memory)
+    stages["legs"]["legs"] = len(legs)
+
+    duties, stages["duties"] = _measure(
+        lambda: DutyGenerator.generate_full_period(legs, loader.duty_rules),
+        repeat,
+        memory,
+    )
+    stages["duties"]["duties"] = duties.num_duties
+
+    def generate_pairings() -> PairingPool:
+        graph = DutyGraph(duties)
+        return PairingPool.from_graph(
+            legs.table,
+            graph,
+            PairingGenerator.generate_paths(graph, loader.pairing_rules),
+        )
+
+    pairings, stages["pairings"] = _measure(generate_pairings, repeat, memory)
+    stages["pairings"]["pairings"] = len(pairings)
+
+    def make_problem() -> ACPProblem:
+        return ACPProblem(legs=legs, pairings=pairings, cost_model=loader.cost_model)
+
+    problem = make_problem()
+    mcec, stages["reduce"] = _measure(
+        lambda: ACP2MCEC().reduce(make_problem(), {"sparse": sparse}), repeat, memory
+    )
+    stages["reduce"]["nnz"] = int(
+        mcec.matrix.nnz if sparse else np.count_nonzero(mcec.matrix)
+    )
+
+    rng = random.Random(0)
+    samples = [rng.getrandbits(len(pairings)) for _ in range(bitstrings)]
+    # The costs of the pairings are computed once, before the timed calls.
+    problem.cost_vector
+    _, stages["cost"] = _measure(
+        lambda: [problem.cost_of_bitstring(sample) for sample in samples],
+        repeat,
+        memory,
+    )
+    stages["cost"]["bitstrings"] = bitstrings
+
+    return {"instance": instance, "days": days, "params": params, "stages": stages}
+
+
+def _case_key(case: dict[str, typing.Any]) -> str:
+    return json.dumps([case["instance"], case["days"], case["params"]], sort_keys=True)
+
+
+def compare(
+    results: list[dict[str, typing.Any]],
+    baseline: list[dict[str, typing.Any]],
+    tolerance: float,
+) -> list[str]:
+    """
+    Returns the regressions of `results` against `baseline`: stages slower or
+    using more memory by more than `tolerance`, and changed output sizes.
+    """
+
+    previous = {_case_key(case): case for case in baseline}
+    regressions = []
+    for case in results:
+        old = previous.get(_case_key(case))
+        if old is None:
+            continue
+        label = f"{case['instance']} days={case['days']} {case['params']}"
+        for stage, new_values in case["stages"].items():
+            old_values = old["stages"].get(stage, {})
+            for key, value in new_values.items():
+                if key not in old_values:
+                    continue
+                before = old_values[key]
+                if key == "time":
+                    if value > MIN_TIME and value > before * (1 + tolerance):
+                        regressions.append(
+                            f"{label} {stage}: time {before:.3f}s -> {value:.3f}s"
+                        )
+                elif key == "peak_memory":
+                    if value > before * (1 + tolerance):
+                        regressions.append(
+                            f"{label} {stage}: peak memory "
+                            f"{before / 2**20:.1f} MiB -> {value / 2**20:.1f} MiB"
+                        )
+                elif value != before:
+                    regressions.append(f"{label} {stage}: {key} {before} -> {value}")
+    return regressions
+
+
+def main(argv: typing.Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--input-dir", type=Path, default=Path(__file__).parents[2])
+    parser.add_argument("--instances", nargs="+", default=INSTANCES)
+    parser.add_argument("--days", nargs="+", type=int, default=[1, 2, 3])
+    parser.add_argument(
+        "--grid",
+        nargs="*",
+        default=[],
+        help="rule thresholds to combine, e.g. MinRest.threshold=9.5,12",
+    )
+    parser.add_argument("--bitstrings", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3, help="keep the best time")
+    parser.add_argument("--dense", action="store_true", help="use a dense matrix")
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", type=Path, default=Path("benchmark.json"))
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = []
+    for instance, days, params in itertools.product(
+        args.instances, args.days, parse_grid(args.grid)
+    ):
+        case = run_case(
+            args.input_dir,
+            instance,
+            days,
+            params,
+            args.bitstrings,
+            args.repeat,
+            not args.no_memory,
+            not args.dense,
+        )
+        results.append(case)
+        print(
+            f"{instance} days={days} {params}: "
+            + ", ".join(
+                f"{stage} {values['time']:.3f}s"
+                for stage, values in case["stages"].items()
+            ),
+            flush=True,
+        )
+
+    args.output.write_text(
+        json.dumps(
+            {
+                "created": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "numpy": np.__version__,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+    if args.baseline is None:
+        return 0
+    regressions = compare(
+        results,
+        json.loads(args.baseline.read_text())["results"],
+        args.tolerance,
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,40 @@
 import typing
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+import numpy as np
 
 from vqaopt.core.problem import Problem
 
 from .cost_model import ACPCostModel
-from .data_model import LegContainer, Pairing
+from .data_model import LegContainer, Pairing, PairingPool
+
+if typing.TYPE_CHECKING:
+    from .reduction.presolve import ACPPostsolve
 
 
 @dataclass
 class ACPProblem(Problem):
     legs: LegContainer
-    pairings: list[Pairing]
+    pairings: typing.Sequence[Pairing]
     cost_model: ACPCostModel
+    metadata: dict[str, typing.Any] = field(default_factory=dict, compare=False)
+    postsolve: "ACPPostsolve | None" = field(default=None, repr=False, compare=False)
+    _cache: dict[str, typing.Any] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        super().__setattr__(name, value)
+        if name in ("legs", "pairings", "cost_model"):
+            self._cache = {}
+
+    def _current_cache(self) -> dict[str, typing.Any]:
+        # The cache is dropped once the number of legs or pairings changed,
+        # e.g. after appending to `pairings` in place.
+        sizes = (len(self.legs), len(self.pairings))
+        if self._cache.setdefault("sizes", sizes) != sizes:
+            self._cache = {"sizes": sizes}
+        return self._cache
 
     @staticmethod
     def get_name() -> str:
@@ -33,9 +56,223 @@ class ACPProblem(Problem):
         )
 
     def cost_of_bitstring(self, bitstring: typing.Iterable | int) -> float:
-        return sum(
-            self.cost_model.cost(p) for p in self.pairings_from_bitstring(bitstring)
-        )
+        return float(self.costs_of_bitstrings([bitstring])[0])
 
     def get_instance_size(self) -> int:
         return len(self.pairings)
+
+    @property
+    def cost_vector(self) -> np.ndarray:
+        """
+        The costs of the pairings, indexed like `pairings`.
+
+        Computed on first access, recomputed after `legs`, `pairings` or
+        `cost_model` is reassigned or the number of legs or pairings changed.
+        Pairings replaced in place by as many others are not noticed,
+        reassign `pairings` instead.
+        """
+
+        cache = self._current_cache()
+        if "cost_vector" not in cache:
+            cache["cost_vector"] = np.fromiter(
+                (self.cost_model.cost(p) for p in self.pairings),
+                dtype=np.float64,
+                count=len(self.pairings),
+            )
+        return cache["cost_vector"]
+
+    def leg_incidence(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the incidence of pairings and legs as coordinate arrays.
+
+        Legs are indexed by their position in `legs`, every pairing contributes
+        only the entries of its own legs. Cached like `cost_vector`.
+
+        Returns
+        ----------
+        tuple[np.ndarray, np.ndarray]
+            The pairing indices and the leg indices of the nonzero entries.
+        """
+
+        cache = self._current_cache()
+        if "leg_incidence" not in cache:
+            chunks = list(self.iter_leg_incidence())
+            cache["leg_incidence"] = (
+                np.concatenate([pairings for pairings, _ in chunks] or [[]]).astype(
+                    np.intp
+                ),
+                np.concatenate([legs for _, legs in chunks] or [[]]).astype(np.intp),
+            )
+        return cache["leg_incidence"]
+
+    def iter_leg_incidence(
+        self, chunk_size: int = 1 << 16
+    ) -> typing.Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Yields the incidence of `leg_incidence` for consecutive chunks of
+        pairings, without building it for all pairings at once.
+
+        Parameters
+        ----------
+        `chunk_size` : int, defaults to 65536
+            The number of pairings per chunk
+
+        Returns
+        ----------
+        Iterator[tuple[np.ndarray, np.ndarray]]
+            The pairing indices and the leg indices of the nonzero entries of
+            each chunk, ordered by pairing.
+        """
+
+        cache = self._current_cache()
+        if "leg_incidence" in cache:
+            pairing_indices, leg_indices = cache["leg_incidence"]
+            for start in range(0, len(self.pairings), chunk_size):
+                lo, hi = np.searchsorted(pairing_indices, [start, start + chunk_size])
+                yield pairing_indices[lo:hi], leg_indices[lo:hi]
+            return
+
+        if (
+            isinstance(self.pairings, PairingPool)
+            and self.pairings.table is self.legs.table
+        ):
+            for start in range(0, len(self.pairings), chunk_size):
+                yield self.pairings.leg_incidence(start, start + chunk_size)
+            return
+
+        leg_index = {leg: j for j, leg in enumerate(self.legs)}
+        for start in range(0, len(self.pairings), chunk_size):
+            pairing_indices: list[int] = []
+            leg_indices: list[int] = []
+            for i in range(start, min(start + chunk_size, len(self.pairings))):
+                for leg in self.pairings[i].legs_iterator:
+                    j = leg_index.get(leg)
+                    if j is not None:
+                        pairing_indices.append(i)
+                        leg_indices.append(j)
+            yield (
+                np.array(pairing_indices, dtype=np.intp),
+                np.array(leg_indices, dtype=np.intp),
+            )
+
+    def bitstring_matrix(
+        self, bitstrings: typing.Iterable[typing.Iterable | int]
+    ) -> np.ndarray:
+        """
+        Unpacks bitstrings into a boolean (bitstrings x pairings) matrix.
+
+        Bitstrings are read like in `pairings_from_bitstring`: the last
+        character, or the least significant bit of an int, selects the first
+        pairing.
+
+        Parameters
+        ----------
+        `bitstrings` : Iterable[Iterable | int]
+            The bitstrings to unpack.
+
+        Returns
+        ----------
+        np.ndarray
+            Entry (i, j) is True if the i-th bitstring selects `pairings[j]`.
+
+        Raises
+        ----------
+        ValueError
+            If a bitstring is a negative int, or selects more pairings than
+            there are.
+        """
+
+        bitstrings = [b if isinstance(b, (int, str)) else list(b) for b in bitstrings]
+        num_pairings = len(self.pairings)
+        for i, bitstring in enumerate(bitstrings):
+            if isinstance(bitstring, int) and bitstring < 0:
+                raise ValueError(f"bitstring {i} is negative")
+            width = (
+                bitstring.bit_length() if isinstance(bitstring, int) else len(bitstring)
+            )
+            if width > num_pairings:
+                raise ValueError(
+                    f"bitstring {i} has {width} bits, expected at most "
+                    f"{num_pairings}, one per pairing"
+                )
+        matrix = np.zeros((len(bitstrings), num_pairings), dtype=bool)
+
+        ints = [i for i, b in enumerate(bitstrings) if isinstance(b, int)]
+        if ints:
+            num_bytes = (num_pairings + 7) // 8
+            raw = b"".join(bitstrings[i].to_bytes(num_bytes, "little") for i in ints)
+            bytes_matrix = np.frombuffer(raw, dtype=np.uint8).reshape(
+                len(ints), num_bytes
+            )
+            matrix[ints] = np.unpackbits(bytes_matrix, axis=1, bitorder="little")[
+                :, :num_pairings
+            ].astype(bool)
+
+        strs = [
+            i
+            for i, b in enumerate(bitstrings)
+            if isinstance(b, str) and len(b) == num_pairings
+        ]
+        if strs:
+            raw = "".join(bitstrings[i] for i in strs).encode("ascii")
+            chars = np.frombuffer(raw, dtype=np.uint8).reshape(len(strs), num_pairings)
+            matrix[strs] = chars[:, ::-1] != ord("0")
+
+        done = set(ints) | set(strs)
+        for i, bitstring in enumerate(bitstrings):
+            if i in done:
+                continue
+            row = np.fromiter((int(b) for b in bitstring), dtype=np.int8)
+            matrix[i, num_pairings - len(row) :] = row[::-1] != 0
+
+        return matrix
+
+    def costs_of_bitstrings(
+        self, bitstrings: typing.Iterable[typing.Iterable | int]
+    ) -> np.ndarray:
+        """
+        Returns the costs of many bitstrings at once.
+
+        Parameters
+        ----------
+        `bitstrings` : Iterable[Iterable | int]
+            The bitstrings to evaluate, see `bitstring_matrix`.
+
+        Returns
+        ----------
+        np.ndarray
+            The cost of the selected pairings for each bitstring.
+        """
+
+        return self.bitstring_matrix(bitstrings) @ self.cost_vector
+
+    def coverage_of_bitstrings(
+        self, bitstrings: typing.Iterable[typing.Iterable | int]
+    ) -> np.ndarray:
+        """
+        Returns how many times the selected pairings cover each leg,
+        for many bitstrings at once.
+
+        Parameters
+        ----------
+        `bitstrings` : Iterable[Iterable | int]
+            The bitstrings to evaluate, see `bitstring_matrix`.
+
+        Returns
+        ----------
+        np.ndarray
+            A (bitstrings x legs) matrix of cover counts, legs are indexed by
+            their position in `legs`. A bitstring is an exact cover if its row
+            is all ones.
+        """
+
+        selected = self.bitstring_matrix(bitstrings)
+        pairing_indices, leg_indices = self.leg_incidence()
+
+        # One bitstring at a time, so that only the incidence is expanded.
+        coverage = np.zeros((len(selected), len(self.legs)), dtype=np.int64)
+        for i, row in enumerate(selected):
+            coverage[i] = np.bincount(
+                leg_indices[row[pairing_indices]], minlength=len(self.legs)
+            )
+        return coverage
@@ -1,12 +1,25 @@
 from .duty import DailyDuties, Duty, DutyContainer
+from .duty_graph import DutyGraph
 from .leg import Leg, LegContainer
+from .leg_table import LegTable
 from .pairing import Pairing
+from .pairing_pool import PairingPool, PairingSink
+from .pool_reduction import PoolReducer, PoolReductionReport
+from .reachability import Reachability, ReachabilityReport
 
 __all__ = [
     "DailyDuties",
     "Duty",
     "DutyContainer",
+    "DutyGraph",
     "Leg",
     "LegContainer",
+    "LegTable",
     "Pairing",
+    "PairingPool",
+    "PairingSink",
+    "PoolReducer",
+    "PoolReductionReport",
+    "Reachability",
+    "ReachabilityReport",
 ]
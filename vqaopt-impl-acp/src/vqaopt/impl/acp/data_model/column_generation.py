@@ -0,0 +1,174 @@
+"""
+Column generation for the set-partitioning LP relaxation of the ACP
+"""
+
+import typing
+from typing import Sequence
+
+import numpy as np
+
+from ..cost_model import ACPCostModel
+from ..data_model import DutyGraph, LegTable
+from ..rule import ACPPairingRule
+from .pairing_labeling import PairingLabeler
+
+# Reduced costs above this are treated as nonnegative.
+_TOLERANCE = 1e-9
+
+
+class ColumnGenerator:
+    """
+    Generates the pairings needed by the LP relaxation of the exact cover.
+
+    The restricted master problem is the LP relaxation of the set-partitioning
+    problem over the pairings generated so far: each leg is covered exactly
+    once, by pairings or by an artificial column with a prohibitive cost. It is
+    solved with the HiGHS solver bundled with SciPy. The duals of the legs
+    price the duties, and the labeling of `PairingLabeler` with the prices
+    subtracted finds the pairings of negative reduced cost. The cheapest of
+    them are added and the master is solved again, until no pairing has a
+    negative reduced cost.
+
+    The pricing is exact under the assumptions of the labeling. The final
+    objective is then the optimum of the LP relaxation over all pairings, a
+    lower bound on the cost of any exact cover.
+    """
+
+    @staticmethod
+    def generate_paths(
+        table: LegTable,
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+        cost_model: ACPCostModel,
+        columns_per_iteration: int = 50,
+        max_iterations: int = 200,
+    ) -> tuple[list[list[int]], dict[str, typing.Any]]:
+        """
+        Generates pairings as lists of duty indices of a DutyGraph.
+
+        The initial pool is made of the pairings of all non-dominated labels,
+        see `PairingLabeler.generate_paths`.
+
+        Parameters
+        ----------
+        table : LegTable
+            The table holding the legs to cover
+        graph : DutyGraph
+            The connection graph of the duties to build pairings from
+        pairing_rules : Sequence[ACPPairingRule]
+            The rules every pairing has to satisfy
+        cost_model : ACPCostModel
+            The cost model of the pairings
+        columns_per_iteration : int, defaults to 50
+            The most pairings to add per iteration
+        max_iterations : int, defaults to 200
+            The most times to solve the master problem
+
+        Returns
+        ----------
+        tuple[list[list[int]], dict[str, Any]]
+            The indices of the duties of each pairing in `graph.duties`, and a
+            summary with the keys:
+
+            - `lp_objective`: the optimum of the last master problem
+            - `lp_lower_bound`: the LP lower bound, None if the pricing did not
+              converge or some legs cannot be covered
+            - `lp_iterations`: the number of master problems solved
+            - `uncovered_legs`: the table rows of the legs the last master
+              problem still covers in part with their artificial column
+            - `lp_duals`: the duals of the legs in the last master problem, by
+              table row
+        """
+
+        from scipy.optimize import linprog
+        from scipy.sparse import csc_array
+
+        duty_arrays = graph.to_arrays(table)
+        duty_rows = [
+            duty_arrays["duty_legs"][start:stop]
+            for start, stop in zip(
+                duty_arrays["duty_offsets"][:-1].tolist(),
+                duty_arrays["duty_offsets"][1:].tolist(),
+            )
+        ]
+        num_legs = len(table)
+
+        costs: dict[tuple[int, ...], float] = {}
+        paths = [
+            label.path
+            for label in PairingLabeler.label(
+                graph, pairing_rules, cost_model, costs=costs
+            )
+        ]
+        known = {tuple(path) for path in paths}
+
+        artificial_cost = 1e3 * max([costs[tuple(path)] for path in paths] + [1.0])
+        objective = 0.0
+        artificial = np.ones(num_legs)
+        duals = np.zeros(num_legs)
+        converged = False
+        iterations = 0
+        while iterations < max_iterations:
+            iterations += 1
+            column_rows = [
+                np.concatenate([duty_rows[index] for index in path]) for path in paths
+            ]
+            lengths = [len(rows) for rows in column_rows]
+            matrix = csc_array(
+                (
+                    np.ones(sum(lengths) + num_legs),
+                    np.concatenate([*column_rows, np.arange(num_legs)]),
+                    np.concatenate(
+                        [[0], np.cumsum(lengths + [1] * num_legs, dtype=np.int64)]
+                    ),
+                ),
+                shape=(num_legs, len(paths) + num_legs),
+            )
+            result = linprog(
+                np.concatenate(
+                    [
+                        [costs[tuple(path)] for path in paths],
+                        np.full(num_legs, artificial_cost),
+                    ]
+                ),
+                A_eq=matrix,
+                b_eq=np.ones(num_legs),
+                bounds=(0, None),
+                method="highs",
+            )
+            if result.status != 0:
+                raise RuntimeError(f"the master problem failed: {result.message}")
+
+            objective = float(result.fun)
+            artificial = result.x[len(paths) :]
+            duals = result.eqlin.marginals
+            duty_prices = [float(duals[rows].sum()) for rows in duty_rows]
+
+            priced = [
+                label
+                for label in PairingLabeler.label(
+                    graph,
+                    pairing_rules,
+                    cost_model,
+                    costs=costs,
+                    duty_prices=duty_prices,
+                )
+                if label.cost < -_TOLERANCE and tuple(label.path) not in known
+            ]
+            if not priced:
+                converged = True
+                break
+
+            priced.sort(key=lambda label: (label.cost, label.path))
+            for label in priced[:columns_per_iteration]:
+                paths.append(label.path)
+                known.add(tuple(label.path))
+
+        uncovered = np.flatnonzero(artificial > _TOLERANCE)
+        return paths, {
+            "lp_objective": objective,
+            "lp_lower_bound": objective if converged and len(uncovered) == 0 else None,
+            "lp_iterations": iterations,
+            "uncovered_legs": uncovered.tolist(),
+            "lp_duals": np.asarray(duals, dtype=np.float64).tolist(),
+        }
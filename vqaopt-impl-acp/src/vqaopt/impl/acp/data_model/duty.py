@@ -4,17 +4,18 @@ Duty related data models and functions
 
 from __future__ import annotations
 
+import itertools
 import typing
 from dataclasses import dataclass, field
-from datetime import date
+from datetime import date, datetime
 from functools import total_ordering
-from uuid import UUID
-from uuid import uuid4 as uuid
 
 from sortedcontainers import SortedList
 
 from .leg import Leg, LegContainer
 
+_duty_ids = itertools.count()
+
 
 @total_ordering
 class Duty:
@@ -23,7 +24,7 @@ class Duty:
 
     Fields
     ----------
-    id : UUID
+    id : int
         The identifier of the fdp, generated automatically
     day : Date
         The date of the day of the departure of the first leg in the fdp
@@ -37,15 +38,16 @@ class Duty:
         The code of the airport the last leg arrives at
     """
 
-    id: UUID
+    id: int
     day: date
     legs: LegContainer
     num_duty_legs: int
     departure_airport: str
     arrival_airport: str
+    _key: tuple[tuple[str, datetime, str], ...] | None = None
 
     def __init__(self, legs: typing.Sequence[Leg]) -> None:
-        self.id = uuid()
+        self.id = next(_duty_ids)
         self.legs = legs if isinstance(legs, LegContainer) else LegContainer(legs)
         self.starts_at_home_base = self.legs[0].is_dep_home_base
         self.day = self.legs[0].departure_datetime.date()
@@ -74,12 +76,20 @@ class Duty:
         if not isinstance(other, Duty):
             return False
 
-        if len(self.legs) != len(other.legs):
-            return False
-        for leg, other_leg in zip(self.legs, other.legs):
-            if leg != other_leg:
-                return False
-        return True
+        return self.key == other.key
+
+    @property
+    def key(self) -> tuple[tuple[str, datetime, str], ...]:
+        """
+        The canonical key of the duty, the tuple of the keys of its legs.
+        """
+
+        if self._key is None:
+            self._key = tuple(leg.key for leg in self.legs)
+        return self._key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
 
     def __repr__(self) -> str:
         return f"Duty with {len(self.legs)} legs"
@@ -131,4 +141,4 @@ class DutyContainer(SortedList):
         """
 
         super().__init__(daily_duties)
-        self.num_duties = sum((daily_duty.num_duties for daily_duty in daily_duties))
+        self.num_duties = sum((daily_duty.num_duties for daily_duty in self))
@@ -1,8 +1,26 @@
-from typing import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Mapping, Sequence
 
-from ..rule import ACPDutyRule, is_valid_duty
+import numpy as np
+
+from ..rule import (
+    ACPDutyRule,
+    AdaptiveRuleOrder,
+    ExtensionBatch,
+    ExtensionBounds,
+    is_valid_duty,
+    is_valid_duty_extension,
+    valid_duty_extensions,
+)
+from ..utils import instrumentation
 from .duty import DailyDuties, Duty, DutyContainer
-from .leg import Leg, LegContainer
+from .leg import LegContainer
+from .leg_table import LegTable
+
+# Below this many candidates of a partial duty the rules are checked one by one,
+# the batch forms only pay off for their array arithmetic on larger batches.
+MIN_BATCH = 16
 
 
 class DutyGenerator:
@@ -34,45 +52,176 @@ class DutyGenerator:
             == leg_container[-1].departure_datetime.date()
         ), "leg_container should only contain legs of a single day"
 
-        to_expand: list[list[Leg]] = [
-            [leg] for leg in leg_container if is_valid_duty([leg], duty_rules)
+        table = leg_container.table
+        return DailyDuties(
+            [
+                Duty(table.legs(rows))
+                for rows in DutyGenerator.generate_rows(table, duty_rules)
+            ]
+        )
+
+    @staticmethod
+    def generate_rows(
+        table: LegTable,
+        duty_rules: Sequence[ACPDutyRule],
+    ) -> list[list[int]]:
+        """
+        Generates duty periods from a LegTable of a single day, as row indices.
+
+        Connections are looked up on the integer columns of the table,
+        Leg objects are only materialized for the rules.
+
+        Parameters
+        ----------
+        `table` : LegTable
+            A LegTable storing legs of a single day.
+
+        Returns
+        ----------
+        list[list[int]]
+            The table rows of the legs of each possible duty.
+        """
+
+        duty_rules = AdaptiveRuleOrder.of(duty_rules)
+        bounds = ExtensionBounds.of(duty_rules)
+
+        # Duties of the maximum count are not expanded, and the departures
+        # scanned for the others end where the longest duty would, allowing
+        # for legs arriving before they depart.
+        def expandable(rows: list[int]) -> bool:
+            return bounds.max_count is None or len(rows) < bounds.max_count
+
+        slack = 0
+        if bounds.max_elapsed is not None and len(table) > 0:
+            slack = max(int((table.departure_time - table.arrival_time).max()), 0)
+        # A leg departs after the previous one arrives, by at least the minimum
+        # gap if there is one.
+        gap = bounds.min_gap or 0
+
+        duties: list[list[int]] = [
+            [row]
+            for row in range(len(table))
+            if is_valid_duty([table.leg(row)], duty_rules)
         ]
-        duties: list[Duty] = [Duty(legs) for legs in to_expand]
+        to_expand = [rows for rows in duties if expandable(rows)]
 
+        recorder = instrumentation.current()
         while len(to_expand) > 0:
             exp = to_expand.pop()
-            last_leg = exp[-1]
-            for leg in leg_container:
-                if last_leg.arrival_airport == leg.departure_airport:
-                    if last_leg.arrival_datetime < leg.departure_datetime:
-                        if is_valid_duty([*exp, leg], duty_rules):
-                            duty = Duty([*exp, leg])
-                            duties.append(duty)
-                            to_expand.append([*exp, leg])
-
-        dailyDuties = DailyDuties(duties)
+            last_row = exp[-1]
+            legs = table.legs(exp)
+            candidates = table.departures(
+                table.arrival_airport[last_row],
+                int(table.arrival_time[last_row]) + gap,
+                (
+                    None
+                    if bounds.max_elapsed is None
+                    else int(table.departure_time[exp[0]]) + bounds.max_elapsed + slack
+                ),
+                inclusive=(gap > 0, True),
+            ).tolist()
+            if recorder is not None:
+                recorder.count("duty_expansions")
+                recorder.count("duty_candidates", len(candidates))
+            if len(candidates) >= MIN_BATCH:
+                batch = ExtensionBatch(
+                    len(exp),
+                    int(table.departure_time[exp[0]]),
+                    int(table.arrival_time[last_row]),
+                    table.departure_time[candidates],
+                    table.arrival_time[candidates],
+                )
+                mask = valid_duty_extensions(
+                    legs, batch, lambda i: table.leg(candidates[i]), duty_rules
+                )
+                candidates = [
+                    row for row, valid in zip(candidates, mask.tolist()) if valid
+                ]
+            else:
+                candidates = [
+                    row
+                    for row in candidates
+                    if is_valid_duty_extension(legs, table.leg(row), duty_rules)
+                ]
+            for row in candidates:
+                duties.append([*exp, row])
+                if expandable(duties[-1]):
+                    to_expand.append(duties[-1])
 
-        return DailyDuties(duties)
+        return duties
 
     @staticmethod
     def generate_full_period(
         leg_container: LegContainer,
         duty_rules: Sequence[ACPDutyRule],
+        workers: int = 1,
     ) -> DutyContainer:
         """
         Generates duty periods for multiple days
 
+        Days are independent, with more than one worker they are distributed
+        to a process pool. Workers receive the columns of their day and return
+        row indices, the result is the same as the sequential one.
+
         Parameters
         ----------
         `leg_container`: LegContainer
             The LegContainer storing legs of multiple days.
+        `workers` : int, defaults to 1
+            The number of worker processes, days are generated in this
+            process if 1.
 
         Returns
         ----------
         DutyContainer
             Sorted list of daily duties.
         """
+
+        table = leg_container.table
+        bounds = table.day_bounds()
+
+        if workers > 1 and len(bounds) > 1:
+            recorder = instrumentation.current()
+            with ProcessPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+                results = list(
+                    pool.map(
+                        _generate_day_rows,
+                        [
+                            table.slice(start, stop).to_arrays()
+                            for start, stop in bounds
+                        ],
+                        repeat(duty_rules),
+                        repeat(recorder is not None),
+                    )
+                )
+            daily_rows = [rows for rows, _ in results]
+            if recorder is not None:
+                for _, recorded in results:
+                    recorder.merge(recorded)
+        else:
+            daily_rows = [
+                DutyGenerator.generate_rows(table.slice(start, stop), duty_rules)
+                for start, stop in bounds
+            ]
+
         return DutyContainer(
-            DutyGenerator.generate(daily_container, duty_rules)
-            for daily_container in leg_container.split_by_day()
+            DailyDuties(
+                [Duty(table.legs(start + row for row in rows)) for rows in day_rows]
+            )
+            for (start, _), day_rows in zip(bounds, daily_rows)
         )
+
+
+def _generate_day_rows(
+    arrays: Mapping[str, np.ndarray],
+    duty_rules: Sequence[ACPDutyRule],
+    record: bool,
+) -> tuple[list[list[int]], dict[str, Any] | None]:
+    # Runs in a worker process on the columns of a single day, and returns what
+    # was recorded for the parent process to merge.
+    table = LegTable.from_arrays(arrays)
+    if not record:
+        return DutyGenerator.generate_rows(table, duty_rules), None
+    with instrumentation.record() as recorder:
+        rows = DutyGenerator.generate_rows(table, duty_rules)
+    return rows, recorder.to_dict()
@@ -0,0 +1,285 @@
+"""
+Connection graph of duty periods
+"""
+
+from __future__ import annotations
+
+import typing
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+import numpy as np
+
+from .duty import DailyDuties, Duty, DutyContainer
+from .leg_table import LegTable, from_minutes, to_minutes
+
+
+class DutyGraph:
+    """
+    Connection graph of the duty periods of a DutyContainer.
+
+    A duty can be followed by the duties of any later day that depart from its
+    arrival airport. The duties of each day are grouped by departure airport
+    and ordered by start time, so the successors of a duty are found without
+    scanning the duties departing elsewhere.
+
+    Duties are identified by their index in `duties`, which follows the order
+    of the DutyContainer. The graph only depends on the duties, it can be
+    reused by repeated pairing generations with different pairing rules.
+
+    Fields
+    ----------
+    `days` : list[date]
+        The days of the container, indexed by position
+    `duties` : list[Duty]
+        All duties of the container
+    `duty_days` : list[int]
+        The index of the day of each duty
+    """
+
+    days: list[date]
+    duties: list[Duty]
+    duty_days: list[int]
+
+    def __init__(self, duty_container: DutyContainer) -> None:
+        """
+        Builds the connection graph of a DutyContainer.
+
+        Parameters
+        ----------
+        `duty_container` : DutyContainer
+            The ordered list of daily duties to connect
+        """
+
+        self.days = []
+        self.duties = []
+        self.duty_days = []
+        self._by_airport: list[dict[str, tuple[list[int], list[int]]]] = []
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._minutes: tuple[np.ndarray, np.ndarray] | None = None
+        self._shortest: int | None = None
+        self._day_offsets: list[int] = [0]
+
+        for day, daily_duties in enumerate(duty_container):
+            self.days.append(daily_duties.day)
+
+            by_airport: dict[str, list[int]] = {}
+            for duty in daily_duties.duties:
+                by_airport.setdefault(duty.departure_airport, []).append(
+                    len(self.duties)
+                )
+                self.duties.append(duty)
+                self.duty_days.append(day)
+                self._starts.append(to_minutes(duty.legs[0].departure_datetime))
+                self._ends.append(to_minutes(duty.legs[-1].arrival_datetime))
+
+            buckets: dict[str, tuple[list[int], list[int]]] = {}
+            for airport, indices in by_airport.items():
+                indices.sort(key=lambda i: self._starts[i])
+                buckets[airport] = ([self._starts[i] for i in indices], indices)
+            self._by_airport.append(buckets)
+            self._day_offsets.append(len(self.duties))
+
+    @classmethod
+    def from_arrays(
+        cls, table: LegTable, arrays: typing.Mapping[str, np.ndarray]
+    ) -> DutyGraph:
+        """
+        Creates a graph from the arrays returned by `to_arrays`.
+
+        Parameters
+        ----------
+        `table` : LegTable
+            The table the arrays refer to
+        `arrays` : Mapping[str, np.ndarray]
+            The legs and the days of the duties
+        """
+
+        offsets = arrays["duty_offsets"].tolist()
+        rows = arrays["duty_legs"]
+        duty_days = arrays["duty_days"].tolist()
+
+        daily: list[list[Duty]] = []
+        for index, day in enumerate(duty_days):
+            if day == len(daily):
+                daily.append([])
+            daily[-1].append(
+                Duty(table.legs(rows[offsets[index] : offsets[index + 1]]))
+            )
+        return cls(DutyContainer(DailyDuties(duties) for duties in daily))
+
+    def to_arrays(self, table: LegTable) -> dict[str, np.ndarray]:
+        """
+        Returns the duties as named arrays of table rows, see `from_arrays`.
+
+        Parameters
+        ----------
+        `table` : LegTable
+            The table holding the legs of the duties
+        """
+
+        duty_legs = [table.rows(duty.legs) for duty in self.duties]
+        return {
+            "duty_offsets": np.concatenate(
+                [[0], np.cumsum([len(rows) for rows in duty_legs], dtype=np.int64)]
+            ),
+            "duty_legs": np.array(
+                [row for rows in duty_legs for row in rows], dtype=np.int32
+            ),
+            "duty_days": np.array(self.duty_days, dtype=np.int32),
+        }
+
+    def subgraph(self, indices: typing.Iterable[int]) -> DutyGraph:
+        """
+        Returns the graph of some of the duties, in their order here.
+
+        Parameters
+        ----------
+        `indices` : Iterable[int]
+            The indices of the duties to keep in ascending order
+        """
+
+        daily: dict[int, list[Duty]] = {}
+        for index in indices:
+            daily.setdefault(self.duty_days[index], []).append(self.duties[index])
+        return DutyGraph(
+            DutyContainer(DailyDuties(duties) for duties in daily.values())
+        )
+
+    def day_range(self, day: int) -> range:
+        """
+        Returns the indices of the duties of a day.
+        """
+
+        return range(self._day_offsets[day], self._day_offsets[day + 1])
+
+    @property
+    def num_days(self) -> int:
+        """
+        Returns the number of days in the graph.
+        """
+
+        return len(self.days)
+
+    def minutes(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the start and end times of the duties in minutes since the
+        epoch of the leg table, indexed like `duties`.
+        """
+
+        if self._minutes is None:
+            self._minutes = (
+                np.array(self._starts, dtype=np.int64),
+                np.array(self._ends, dtype=np.int64),
+            )
+        return self._minutes
+
+    def shortest_duration(self) -> int:
+        """
+        Returns the least time from the start to the end of a duty in minutes,
+        0 if there are no duties.
+        """
+
+        if self._shortest is None:
+            self._shortest = min(
+                (end - start for start, end in zip(self._starts, self._ends)),
+                default=0,
+            )
+        return self._shortest
+
+    def successors(
+        self,
+        day: int,
+        airport: str,
+        last_day: int | None = None,
+        earliest: datetime | None = None,
+    ) -> typing.Iterator[tuple[int, int]]:
+        """
+        Returns an iterator of the duties that can follow a duty.
+
+        Parameters
+        ----------
+        `day` : int
+            The index of the day of the duty to continue
+        `airport` : str
+            The arrival airport of the duty to continue
+        `last_day` : int | None, defaults to None
+            The index of the last day to consider, all later days if None
+        `earliest` : datetime | None, defaults to None
+            The earliest start time to consider, unbounded if None
+
+        Returns
+        ----------
+        Iterator[tuple[int, int]]
+            The index of the day and the index of each duty departing from
+            `airport` on a later day, ordered by day and start time.
+        """
+
+        minutes = None
+        if earliest is not None:
+            # Starts are whole minutes, the first one not before `earliest`.
+            minutes = to_minutes(earliest)
+            if from_minutes(minutes) < earliest:
+                minutes += 1
+        return self._successors(day, airport, last_day, minutes, None)
+
+    def successors_of(
+        self,
+        index: int,
+        last_day: int | None = None,
+        min_gap: int | None = None,
+        latest: int | None = None,
+    ) -> typing.Iterator[tuple[int, int]]:
+        """
+        Returns an iterator of the duties that can follow the duty `index`,
+        within a window in minutes, see `successors` and `minutes`.
+
+        Parameters
+        ----------
+        `index` : int
+            The index of the duty to continue
+        `last_day` : int | None, defaults to None
+            The index of the last day to consider, all later days if None
+        `min_gap` : int | None, defaults to None
+            The least time from the end of the duty to the start of the next
+            one, unbounded if None
+        `latest` : int | None, defaults to None
+            The latest start time to consider, unbounded if None
+
+        Returns
+        ----------
+        Iterator[tuple[int, int]]
+            The index of the day and the index of each duty departing from
+            the arrival airport of the duty on a later day within the window,
+            ordered by day and start time.
+        """
+
+        return self._successors(
+            self.duty_days[index],
+            self.duties[index].arrival_airport,
+            last_day,
+            None if min_gap is None else self._ends[index] + min_gap,
+            latest,
+        )
+
+    def _successors(
+        self,
+        day: int,
+        airport: str,
+        last_day: int | None,
+        earliest: int | None,
+        latest: int | None,
+    ) -> typing.Iterator[tuple[int, int]]:
+        if last_day is None or last_day >= len(self.days):
+            last_day = len(self.days) - 1
+
+        for next_day in range(day + 1, last_day + 1):
+            bucket = self._by_airport[next_day].get(airport)
+            if bucket is None:
+                continue
+            times, indices = bucket
+            start = 0 if earliest is None else bisect_left(times, earliest)
+            stop = len(times) if latest is None else bisect_right(times, latest)
+            for index in indices[start:stop]:
+                yield next_day, index
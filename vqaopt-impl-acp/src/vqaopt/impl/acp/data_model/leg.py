@@ -11,6 +11,9 @@ from functools import total_ordering
 
 from sortedcontainers import SortedList
 
+if typing.TYPE_CHECKING:
+    from .leg_table import LegTable
+
 
 @dataclass()
 @total_ordering
@@ -41,6 +44,17 @@ class Leg:
     flight_designator: str
     is_dep_home_base: bool = field(compare=False)
 
+    @property
+    def key(self) -> tuple[str, datetime, str]:
+        """
+        The canonical key of the leg, equal legs have equal keys.
+        """
+
+        return (self.departure_airport, self.departure_datetime, self.flight_designator)
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
     def __lt__(self, other: Leg) -> bool:
         if self.departure_datetime == other.departure_datetime:
             return self.departure_airport < other.departure_airport
@@ -53,8 +67,13 @@ class Leg:
 class LegContainer(SortedList):
     """
     A sorted list of flight legs.
+
+    The legs are mirrored by a columnar LegTable (see `table`), built on first
+    use and dropped whenever the container changes.
     """
 
+    _table: LegTable | None = None
+
     def __init__(self, legs: typing.Iterable[Leg]) -> None:
         """
         Initialize a sorted list of flight legs from an iterable of flight legs.
@@ -92,3 +111,78 @@ class LegContainer(SortedList):
         daily_legs.append(LegContainer(self.islice(from_index)))
 
         return daily_legs
+
+    @property
+    def table(self) -> LegTable:
+        """
+        The columnar view of the container, rows follow the container order
+        and `table.leg(i)` is `self[i]`.
+        """
+
+        if self._table is None:
+            from .leg_table import LegTable
+
+            self._table = LegTable.from_legs(self)
+        return self._table
+
+    def departures(
+        self,
+        airport: str,
+        earliest: datetime | None = None,
+        latest: datetime | None = None,
+        inclusive: tuple[bool, bool] = (True, True),
+    ) -> list[Leg]:
+        """
+        Returns the legs departing from `airport` within a time window,
+        compared with minute resolution.
+
+        Parameters
+        ----------
+        `airport` : str
+            The code of the departure airport
+        `earliest` : datetime | None, defaults to None
+            The start of the departure window, unbounded if None
+        `latest` : datetime | None, defaults to None
+            The end of the departure window, unbounded if None
+        `inclusive` : tuple[bool, bool], defaults to (True, True)
+            Whether the start and the end of the window are inclusive
+
+        Returns
+        ----------
+        list[Leg]
+            The legs in the window in the order of the container.
+        """
+
+        from .leg_table import to_minutes
+
+        table = self.table
+        airport_id = table.airport_id(airport)
+        if airport_id is None:
+            return []
+
+        rows = table.departures(
+            airport_id,
+            None if earliest is None else to_minutes(earliest),
+            None if latest is None else to_minutes(latest),
+            inclusive,
+        )
+        return table.legs(rows)
+
+    def add(self, value: Leg) -> None:
+        super().add(value)
+        self._table = None
+
+    def update(self, iterable: typing.Iterable[Leg]) -> None:
+        super().update(iterable)
+        self._table = None
+
+    def clear(self) -> None:
+        super().clear()
+        self._table = None
+
+    def _delete(self, pos: int, idx: int) -> None:
+        super()._delete(pos, idx)
+        self._table = None
+
+    _update = update
+    _clear = clear
@@ -0,0 +1,437 @@
+"""
+Columnar storage of flight legs.
+"""
+
+from __future__ import annotations
+
+import typing
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .leg import Leg, LegContainer
+
+EPOCH = datetime(1970, 1, 1)
+MINUTES_PER_DAY = 24 * 60
+
+_TIME_BITS = 40
+_TIME_MASK = (1 << _TIME_BITS) - 1
+
+
+def to_minutes(moment: datetime) -> int:
+    """
+    Returns the number of whole minutes between the epoch and a naive datetime.
+    """
+
+    return (moment - EPOCH) // timedelta(minutes=1)
+
+
+def from_minutes(minutes: int) -> datetime:
+    """
+    Returns the naive datetime `minutes` minutes after the epoch.
+    """
+
+    return EPOCH + timedelta(minutes=int(minutes))
+
+
+class LegTable:
+    """
+    A struct-of-arrays store of flight legs.
+
+    Legs are stored in the order of a LegContainer (by departure time, then
+    departure airport) as NumPy arrays. Airports are interned to integer IDs
+    assigned in the order of their codes, times are minutes since the epoch.
+    Leg objects are only materialized when requested through `leg` or `legs`.
+
+    Fields
+    ----------
+    `airports` : list[str]
+        The airport codes, indexed by airport ID
+    `departure_airport` : np.ndarray
+        The ID of the departure airport of each leg
+    `departure_time` : np.ndarray
+        The departure of each leg in minutes since the epoch
+    `arrival_airport` : np.ndarray
+        The ID of the arrival airport of each leg
+    `arrival_time` : np.ndarray
+        The arrival of each leg in minutes since the epoch
+    `flight_designator` : np.ndarray
+        The flight designator of each leg
+    `is_dep_home_base` : np.ndarray
+        Whether the departure airport of each leg is a home base
+    """
+
+    airports: list[str]
+    departure_airport: np.ndarray
+    departure_time: np.ndarray
+    arrival_airport: np.ndarray
+    arrival_time: np.ndarray
+    flight_designator: np.ndarray
+    is_dep_home_base: np.ndarray
+
+    def __init__(
+        self,
+        airports: typing.Sequence[str],
+        departure_airport: np.ndarray,
+        departure_time: np.ndarray,
+        arrival_airport: np.ndarray,
+        arrival_time: np.ndarray,
+        flight_designator: np.ndarray,
+        is_dep_home_base: np.ndarray,
+        legs: typing.Sequence[Leg] | None = None,
+    ) -> None:
+        """
+        Initialize a table from columns that are already in LegContainer order.
+
+        Parameters
+        ----------
+        `airports` : Sequence[str]
+            The airport codes, indexed by airport ID
+        `legs` : Sequence[Leg] | None, defaults to None
+            Leg objects matching the rows, if they already exist
+        """
+
+        self.airports = list(airports)
+        self.departure_airport = np.asarray(departure_airport, dtype=np.int32)
+        self.departure_time = np.asarray(departure_time, dtype=np.int64)
+        self.arrival_airport = np.asarray(arrival_airport, dtype=np.int32)
+        self.arrival_time = np.asarray(arrival_time, dtype=np.int64)
+        self.flight_designator = np.asarray(flight_designator, dtype=np.str_)
+        self.is_dep_home_base = np.asarray(is_dep_home_base, dtype=np.bool_)
+
+        self._airport_ids = {code: i for i, code in enumerate(self.airports)}
+        self._legs: list[Leg | None] = (
+            list(legs) if legs is not None else [None] * len(self)
+        )
+        self._time_origin = int(self.departure_time.min()) if len(self) > 0 else 0
+        self._departure_order: np.ndarray | None = None
+        self._departure_keys: list[int] | None = None
+        self._rows: dict[tuple[int, int, str], int] | None = None
+
+    @classmethod
+    def from_columns(
+        cls,
+        departure_airport: typing.Sequence[str],
+        departure_time: np.ndarray,
+        arrival_airport: typing.Sequence[str],
+        arrival_time: np.ndarray,
+        flight_designator: typing.Sequence[str],
+        is_dep_home_base: np.ndarray,
+    ) -> LegTable:
+        """
+        Creates a table from unordered columns with airport codes,
+        sorting the rows once.
+        """
+
+        airports, airport_ids = np.unique(
+            np.concatenate(
+                [
+                    np.asarray(departure_airport, dtype=np.str_),
+                    np.asarray(arrival_airport, dtype=np.str_),
+                ]
+            ),
+            return_inverse=True,
+        )
+        num_legs = len(departure_airport)
+        dep_ids = airport_ids[:num_legs]
+        arr_ids = airport_ids[num_legs:]
+        departure_time = np.asarray(departure_time, dtype=np.int64)
+
+        order = np.lexsort((dep_ids, departure_time))
+        return cls(
+            airports.tolist(),
+            dep_ids[order],
+            departure_time[order],
+            arr_ids[order],
+            np.asarray(arrival_time, dtype=np.int64)[order],
+            np.asarray(flight_designator, dtype=np.str_)[order],
+            np.asarray(is_dep_home_base, dtype=np.bool_)[order],
+        )
+
+    @classmethod
+    def from_legs(cls, legs: typing.Iterable[Leg]) -> LegTable:
+        """
+        Creates a table from legs, keeping the Leg objects for `leg`.
+
+        Parameters
+        ----------
+        `legs` : Iterable[Leg]
+            The legs, ordered like in a LegContainer
+        """
+
+        legs = list(legs)
+        airports = sorted(
+            {leg.departure_airport for leg in legs}
+            | {leg.arrival_airport for leg in legs}
+        )
+        airport_ids = {code: i for i, code in enumerate(airports)}
+        return cls(
+            airports,
+            np.fromiter(
+                (airport_ids[leg.departure_airport] for leg in legs),
+                dtype=np.int32,
+                count=len(legs),
+            ),
+            np.fromiter(
+                (to_minutes(leg.departure_datetime) for leg in legs),
+                dtype=np.int64,
+                count=len(legs),
+            ),
+            np.fromiter(
+                (airport_ids[leg.arrival_airport] for leg in legs),
+                dtype=np.int32,
+                count=len(legs),
+            ),
+            np.fromiter(
+                (to_minutes(leg.arrival_datetime) for leg in legs),
+                dtype=np.int64,
+                count=len(legs),
+            ),
+            np.array([leg.flight_designator for leg in legs], dtype=np.str_),
+            np.fromiter(
+                (leg.is_dep_home_base for leg in legs), dtype=np.bool_, count=len(legs)
+            ),
+            legs,
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: typing.Mapping[str, np.ndarray]) -> LegTable:
+        """
+        Creates a table from the arrays returned by `to_arrays`.
+        """
+
+        return cls(
+            arrays["airports"].tolist(),
+            arrays["departure_airport"],
+            arrays["departure_time"],
+            arrays["arrival_airport"],
+            arrays["arrival_time"],
+            arrays["flight_designator"],
+            arrays["is_dep_home_base"],
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """
+        Returns the columns of the table as named arrays, see `from_arrays`.
+        """
+
+        return {
+            "airports": np.array(self.airports, dtype=np.str_),
+            "departure_airport": self.departure_airport,
+            "departure_time": self.departure_time,
+            "arrival_airport": self.arrival_airport,
+            "arrival_time": self.arrival_time,
+            "flight_designator": self.flight_designator,
+            "is_dep_home_base": self.is_dep_home_base,
+        }
+
+    def __len__(self) -> int:
+        return len(self.departure_time)
+
+    def airport_id(self, code: str) -> int | None:
+        """
+        Returns the ID of an airport, None if no leg touches it.
+        """
+
+        return self._airport_ids.get(code)
+
+    def leg(self, index: int) -> Leg:
+        """
+        Returns the Leg at `index`, materializing it on first access.
+        """
+
+        leg = self._legs[index]
+        if leg is None:
+            leg = Leg(
+                self.airports[self.departure_airport[index]],
+                from_minutes(self.departure_time[index]),
+                self.airports[self.arrival_airport[index]],
+                from_minutes(self.arrival_time[index]),
+                str(self.flight_designator[index]),
+                bool(self.is_dep_home_base[index]),
+            )
+            self._legs[index] = leg
+        return leg
+
+    def legs(self, indices: typing.Iterable[int] | None = None) -> list[Leg]:
+        """
+        Returns the Legs at `indices`, or all of them if None.
+        """
+
+        if indices is None:
+            self._materialize_all()
+            return typing.cast(list[Leg], list(self._legs))
+        return [self.leg(int(index)) for index in indices]
+
+    def _materialize_all(self) -> None:
+        # Converts the time columns in bulk instead of one leg at a time.
+        if all(leg is not None for leg in self._legs):
+            return
+
+        airports = self.airports
+        columns = zip(
+            self.departure_airport.tolist(),
+            self.departure_time.astype("datetime64[m]").tolist(),
+            self.arrival_airport.tolist(),
+            self.arrival_time.astype("datetime64[m]").tolist(),
+            self.flight_designator.tolist(),
+            self.is_dep_home_base.tolist(),
+        )
+        self._legs = [
+            (
+                Leg(airports[dep], dep_time, airports[arr], arr_time, designator, home)
+                if leg is None
+                else leg
+            )
+            for leg, (dep, dep_time, arr, arr_time, designator, home) in zip(
+                self._legs, columns
+            )
+        ]
+
+    def rows(self, legs: typing.Iterable[Leg]) -> list[int]:
+        """
+        Returns the rows of legs equal to `legs`.
+
+        Raises
+        ----------
+        KeyError
+            If a leg is not in the table.
+        """
+
+        if self._rows is None:
+            self._rows = {
+                key: row
+                for row, key in enumerate(
+                    zip(
+                        self.departure_airport.tolist(),
+                        self.departure_time.tolist(),
+                        self.flight_designator.tolist(),
+                    )
+                )
+            }
+        return [
+            self._rows[
+                (
+                    self._airport_ids[leg.departure_airport],
+                    to_minutes(leg.departure_datetime),
+                    leg.flight_designator,
+                )
+            ]
+            for leg in legs
+        ]
+
+    def slice(self, start: int, stop: int) -> LegTable:
+        """
+        Returns a table of the rows `start` to `stop`, sharing the airport IDs
+        and the Leg objects of this table.
+        """
+
+        return LegTable(
+            self.airports,
+            self.departure_airport[start:stop],
+            self.departure_time[start:stop],
+            self.arrival_airport[start:stop],
+            self.arrival_time[start:stop],
+            self.flight_designator[start:stop],
+            self.is_dep_home_base[start:stop],
+            self._legs[start:stop],
+        )
+
+    def to_container(self) -> LegContainer:
+        """
+        Returns a LegContainer of all legs of the table, with this table as
+        its `table`.
+        """
+
+        container = LegContainer(self.legs())
+        container._table = self
+        return container
+
+    def day_bounds(self) -> list[tuple[int, int]]:
+        """
+        Returns the (start, stop) row ranges of the legs departing on each day.
+        """
+
+        if len(self) == 0:
+            return []
+
+        days = self.departure_time // MINUTES_PER_DAY
+        starts = np.flatnonzero(np.diff(days)) + 1
+        bounds = np.concatenate([[0], starts, [len(self)]])
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def departures(
+        self,
+        airport: int,
+        earliest: int | None = None,
+        latest: int | None = None,
+        inclusive: tuple[bool, bool] = (True, True),
+    ) -> np.ndarray:
+        """
+        Returns the rows of the legs departing from an airport within a window.
+
+        Parameters
+        ----------
+        `airport` : int
+            The ID of the departure airport
+        `earliest` : int | None, defaults to None
+            The start of the departure window in minutes, unbounded if None
+        `latest` : int | None, defaults to None
+            The end of the departure window in minutes, unbounded if None
+        `inclusive` : tuple[bool, bool], defaults to (True, True)
+            Whether the start and the end of the window are inclusive
+
+        Returns
+        ----------
+        np.ndarray
+            The row indices in ascending order.
+        """
+
+        if self._departure_order is None or self._departure_keys is None:
+            self._departure_order = np.lexsort(
+                (self.departure_time, self.departure_airport)
+            )
+            self._departure_keys = [
+                self._departure_key(airport_id, minutes)
+                for airport_id, minutes in zip(
+                    self.departure_airport[self._departure_order].tolist(),
+                    self.departure_time[self._departure_order].tolist(),
+                )
+            ]
+
+        # Times before the first departure have no key of their own, a window
+        # ending there is empty and one starting there is unbounded.
+        if latest is not None and latest < self._time_origin:
+            return self._departure_order[:0]
+        if earliest is not None and earliest < self._time_origin:
+            earliest = None
+
+        if earliest is None:
+            start = bisect_left(
+                self._departure_keys, self._departure_key(airport, self._time_origin)
+            )
+        else:
+            bisect_start = bisect_left if inclusive[0] else bisect_right
+            start = bisect_start(
+                self._departure_keys, self._departure_key(airport, earliest)
+            )
+        if latest is None:
+            stop = bisect_left(
+                self._departure_keys,
+                self._departure_key(airport + 1, self._time_origin),
+            )
+        else:
+            bisect_stop = bisect_right if inclusive[1] else bisect_left
+            stop = bisect_stop(
+                self._departure_keys, self._departure_key(airport, latest)
+            )
+
+        return self._departure_order[start:stop]
+
+    def _departure_key(self, airport: int, minutes: int) -> int:
+        # Airport in the high bits, time relative to the table in the low bits,
+        # clipped so that windows reaching past the table stay within the
+        # airport. Times before the table are handled by `departures`.
+        offset = min(max(int(minutes) - self._time_origin, 0), _TIME_MASK)
+        return (int(airport) << _TIME_BITS) | offset
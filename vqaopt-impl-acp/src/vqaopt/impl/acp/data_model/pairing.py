@@ -2,14 +2,15 @@
 Pairing related dataclasses and functions
 """
 
+import itertools
 from datetime import datetime
 from typing import Iterable, Iterator
-from uuid import UUID
-from uuid import uuid4 as uuid
 
 from .duty import Duty
 from .leg import Leg
 
+_pairing_ids = itertools.count()
+
 
 class Pairing:
     """
@@ -17,7 +18,7 @@ class Pairing:
 
     Field
     ----------
-    `id` : UUID
+    `id` : int
         The identifier of the pairing, generated automatically
     `duties` : list[Duty]
         A list of duties in the pairing
@@ -34,7 +35,7 @@ class Pairing:
         The end datetime of the pairing
     """
 
-    id: UUID
+    id: int
     duties: list[Duty]
     legs: Iterator[Leg]
     duty_legs: Iterator[Leg]
@@ -52,7 +53,7 @@ class Pairing:
             The duties in the pairing
         """
 
-        self.id = uuid()
+        self.id = next(_pairing_ids)
         self.duties = list(duties)
         self.home_base = self.duties[0].departure_airport
         self.start_datetime = self.duties[0].legs[0].departure_datetime
@@ -66,5 +67,22 @@ class Pairing:
 
         return (leg for duty in self.duties for leg in duty.legs)
 
+    @property
+    def key(self) -> tuple[tuple[tuple[str, datetime, str], ...], ...]:
+        """
+        The canonical key of the pairing, the tuple of the keys of its duties.
+        """
+
+        return tuple(duty.key for duty in self.duties)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Pairing):
+            return False
+
+        return self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
     def __repr__(self) -> str:
         return f"Pairing with {len(self.duties)} duties"
@@ -0,0 +1,473 @@
+"""
+Bidirectional pairing construction, joining forward and backward halves of the
+pairings on their middle duty
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterator, Sequence
+
+import numpy as np
+
+from ..data_model import DutyGraph
+from ..rule import (
+    ACPPairingRule,
+    AdaptiveRuleOrder,
+    ExtensionBatch,
+    ExtensionBounds,
+    valid_pairing_joins,
+)
+from ..utils import instrumentation
+from .pairing_generation import PairingGenerator
+from .pairing_join import JOIN_CHUNK, DutyTable, JoinGenerator, RootLimits
+from .reachability import NEVER, Reachability
+
+_INT64 = np.iinfo(np.int64)
+
+# The number of forward halves joined at once. Each of them is completed along
+# all of its backward halves before the next chunk, so fewer than JOIN_CHUNK
+# keep the rows in flight comparable to the join engine.
+SEAM_CHUNK = JOIN_CHUNK // 8
+
+
+@dataclass
+class BackwardHalves:
+    """
+    The sequences of connected duties ending at each home base, as a trie from
+    their first duty, the middle duty of the pairings they end.
+
+    The nodes of a depth are the distinct prefixes of that many duties plus
+    one of the halves, sorted by their parent and then by the start of their
+    last duty. Every node can be completed into a half, the depth 0 nodes are
+    indexed by home base, departure airport and start of their middle duty.
+
+    Fields
+    ----------
+    `max_length` : int
+        The maximum number of duties of a half
+    `num_airports` : int
+        The number of airports, see `keys`
+    `keys` : np.ndarray
+        The home base, the departure airport and the start time of the middle
+        duty of each depth 0 node as one sorted key, see `DutyTable.key`
+    `bases` : np.ndarray
+        The home base of each depth 0 node
+    `duties` : list[np.ndarray]
+        The last duty of each node, by depth
+    `closing` : list[np.ndarray]
+        Whether each node is a half itself, arriving at its home base, by depth
+    `last_days` : list[np.ndarray]
+        The earliest day of the last duty of the halves through each node, by
+        depth
+    `last_starts` : list[np.ndarray]
+        The earliest start of the last duty of the halves through each node,
+        by depth
+    `children` : list[np.ndarray]
+        The first child of each node and the end, the children of the node
+        `i` of depth `d` are the nodes `children[d][i]` to
+        `children[d][i + 1]` of depth `d + 1`
+    """
+
+    max_length: int
+    num_airports: int
+    keys: np.ndarray
+    bases: np.ndarray
+    duties: list[np.ndarray]
+    closing: list[np.ndarray]
+    last_days: list[np.ndarray]
+    last_starts: list[np.ndarray]
+    children: list[np.ndarray]
+
+    @classmethod
+    def of(
+        cls,
+        graph: DutyGraph,
+        table: DutyTable,
+        reachability: Reachability,
+        base_airports: np.ndarray,
+        bounds: ExtensionBounds,
+        max_length: int,
+    ) -> BackwardHalves:
+        """
+        Searches the halves of at most `max_length` duties backwards from the
+        duties arriving at each home base.
+
+        Only the connections of the graph and the limits of `bounds` are
+        followed, the rules are checked when the halves are joined.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties
+        table : DutyTable
+            The duties of `graph` as columns
+        reachability : Reachability
+            The reachability of the home bases in `graph`
+        base_airports : np.ndarray
+            The number of the airport of each home base, -1 if unknown
+        bounds : ExtensionBounds
+            The limits of the pairing rules
+        max_length : int
+            The maximum number of duties of a half
+        """
+
+        ordinals = np.array([day.toordinal() for day in graph.days], dtype=np.int64)
+        ordinals = ordinals[table.days]
+        predecessors, successors = _connections(table, ordinals, bounds)
+        by_successor = np.argsort(successors, kind="stable")
+        predecessors = predecessors[by_successor]
+        offsets = np.searchsorted(
+            successors[by_successor], np.arange(len(table.days) + 1)
+        )
+
+        # Halves of each length, as duty matrices with the home base of each.
+        reached = reachability.start_days > -NEVER
+        bases, duties = np.nonzero(
+            (table.arrivals[None, :] == base_airports[:, None]) & reached.T
+        )
+        levels = [(bases, duties[:, None])]
+        for _ in range(1, max_length):
+            bases, halves = levels[-1]
+            counts = offsets[halves[:, 0] + 1] - offsets[halves[:, 0]]
+            rows = np.repeat(np.arange(len(halves)), counts)
+            previous = predecessors[
+                np.repeat(offsets[halves[:, 0]], counts)
+                + np.arange(len(rows))
+                - np.repeat(np.cumsum(counts) - counts, counts)
+            ]
+            last = halves[rows, -1]
+            keep = reached[previous, bases[rows]]
+            if bounds.max_days is not None:
+                keep &= ordinals[last] - ordinals[previous] <= bounds.max_days
+            if bounds.max_elapsed is not None:
+                keep &= table.ends[last] - table.starts[previous] <= bounds.max_elapsed
+            rows, previous = rows[keep], previous[keep]
+            levels.append((bases[rows], np.column_stack([previous, halves[rows]])))
+
+        # All halves padded to the maximum length, sorted so that the prefixes
+        # of each depth are contiguous and in the order of the nodes.
+        lengths = np.concatenate(
+            [np.full(len(halves), halves.shape[1]) for _, halves in levels]
+        )
+        bases = np.concatenate([bases for bases, _ in levels])
+        padded = np.full((len(lengths), max_length), -1, dtype=np.int64)
+        start = 0
+        for _, halves in levels:
+            padded[start : start + len(halves), : halves.shape[1]] = halves
+            start += len(halves)
+        times = np.where(padded >= 0, table.starts[padded], _INT64.min)
+        order = np.lexsort(
+            [
+                column
+                for depth in reversed(range(max_length))
+                for column in (padded[:, depth], times[:, depth])
+            ]
+            + [table.departures[padded[:, 0]], bases]
+        )
+        bases, padded, lengths = bases[order], padded[order], lengths[order]
+        last = padded[np.arange(len(padded)), lengths - 1]
+
+        halves = cls(
+            max_length=max_length,
+            num_airports=int(table.departures.max(initial=0)) + 1,
+            keys=np.empty(0, dtype=np.int64),
+            bases=np.empty(0, dtype=np.int64),
+            duties=[],
+            closing=[],
+            last_days=[],
+            last_starts=[],
+            children=[],
+        )
+        parents = np.zeros(len(padded), dtype=np.int64)
+        for depth in range(max_length):
+            rows = np.flatnonzero(lengths > depth)
+            new = np.ones(len(rows), dtype=bool)
+            new[1:] = (parents[rows[1:]] != parents[rows[:-1]]) | (
+                padded[rows[1:], depth] != padded[rows[:-1], depth]
+            )
+            if depth == 0:
+                new[1:] |= bases[rows[1:]] != bases[rows[:-1]]
+            nodes = np.cumsum(new) - 1
+            firsts = rows[new]
+            num_nodes = len(firsts)
+
+            duties = padded[firsts, depth]
+            halves.duties.append(duties)
+            halves.closing.append(
+                table.arrivals[duties] == base_airports[bases[firsts]]
+            )
+            last_days = np.full(num_nodes, _INT64.max, dtype=np.int64)
+            last_starts = np.full(num_nodes, _INT64.max, dtype=np.int64)
+            np.minimum.at(last_days, nodes, table.days[last[rows]])
+            np.minimum.at(last_starts, nodes, table.starts[last[rows]])
+            halves.last_days.append(last_days)
+            halves.last_starts.append(last_starts)
+            if depth == 0:
+                halves.bases = bases[firsts]
+                halves.keys = table.key(
+                    halves.bases * halves.num_airports + table.departures[duties],
+                    table.starts[duties],
+                )
+            else:
+                halves.children.append(
+                    np.searchsorted(
+                        parents[firsts], np.arange(len(halves.duties[-2]) + 1)
+                    )
+                )
+            parents[rows] = nodes
+        halves.children.append(np.zeros(len(halves.duties[-1]) + 1, dtype=np.int64))
+        return halves
+
+
+class BidirectionalGenerator:
+    """
+    Pairing generator joining forward halves of the pairings with backward
+    halves into their home base.
+
+    Pairings are split after their first `max_count - max_count // 2` duties,
+    where `max_count` is the maximum number of duties of the rules. The
+    forward halves are built level by level from the roots like in
+    `JoinGenerator`, the pairings of up to that many duties are found on the
+    way. The backward halves of up to `max_count // 2` duties are searched
+    once for all roots, back from the duties arriving at each home base, see
+    `BackwardHalves`. The last duty of each forward half is joined with the
+    middle duties departing from its arrival airport at its home base after
+    the minimum gap, and each join is extended along the halves while the
+    rules hold, see `ACPRule.is_valid_join_batch`. Halves that can not end
+    within the horizon of the root are dropped before the rules are checked.
+
+    Only partial pairings that can still close within the maximum count are
+    checked beyond the seam, which pays off when the maximum count binds
+    before the other limits of the rules. Otherwise nearly every partial
+    pairing closes and the join engine does the same work with less setup.
+
+    The pairings are the ones of `PairingGenerator.generate_paths`, ordered by
+    their forward half.
+    """
+
+    @staticmethod
+    def generate_paths(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+    ) -> list[list[int]]:
+        """
+        Generates valid pairings as lists of duty indices of a DutyGraph.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties to build pairings from
+
+        Returns
+        ----------
+        list[list[int]]
+            The indices of the duties of each pairing in `graph.duties`, see
+            `iter_paths`.
+        """
+
+        return list(BidirectionalGenerator.iter_paths(graph, pairing_rules))
+
+    @staticmethod
+    def iter_paths(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+    ) -> Iterator[list[int]]:
+        """
+        Yields valid pairings as lists of duty indices of a DutyGraph.
+
+        Single-duty pairings come first in the order of their duties, followed
+        by the pairings of each number of duties up to the seam. The longer
+        pairings follow for each chunk of `SEAM_CHUNK` forward halves, by
+        number of duties. Without a maximum count the pairings are those of
+        `JoinGenerator.iter_paths`.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties to build pairings from
+        """
+
+        pairing_rules = AdaptiveRuleOrder.of(pairing_rules)
+        bounds = ExtensionBounds.of(pairing_rules)
+        if bounds.max_count is None:
+            yield from JoinGenerator.iter_paths(graph, pairing_rules)
+            return
+
+        roots = PairingGenerator.roots(graph, pairing_rules)
+        yield from PairingGenerator.single_duty_paths(graph, roots)
+        reachability = PairingGenerator.reachability(graph, pairing_rules, roots)
+        table = DutyTable.of(graph)
+        limits = RootLimits.of(graph, table, roots, reachability, bounds)
+        forward_length = bounds.max_count - bounds.max_count // 2
+
+        recorder = instrumentation.current()
+        level = np.asarray(
+            [
+                [root]
+                for root in roots
+                if reachability.close_days[root, limits.bases[root]]
+                <= limits.deadlines[root]
+            ],
+            dtype=np.int32,
+        ).reshape(-1, 1)
+        while len(level) and level.shape[1] < forward_length:
+            if recorder is not None:
+                recorder.count("pairing_partials", len(level))
+            extended = []
+            for chunk in range(0, len(level), JOIN_CHUNK):
+                joined = JoinGenerator.join(
+                    graph,
+                    table,
+                    level[chunk : chunk + JOIN_CHUNK],
+                    pairing_rules,
+                    reachability,
+                    limits,
+                    bounds,
+                )
+                closing = (
+                    table.arrivals[joined[:, -1]] == table.departures[joined[:, 0]]
+                )
+                yield from joined[closing].tolist()
+                extended.append(joined)
+            level = np.concatenate(extended)
+        if not len(level) or bounds.max_count == forward_length:
+            return
+
+        base_airports = np.full(len(reachability.home_bases), -1, dtype=np.int64)
+        base_airports[limits.bases[roots]] = table.departures[roots]
+        halves = BackwardHalves.of(
+            graph,
+            table,
+            reachability,
+            base_airports,
+            bounds,
+            bounds.max_count // 2,
+        )
+        if recorder is not None:
+            recorder.count("pairing_partials", len(level))
+            recorder.count(
+                "pairing_halves",
+                sum(int(closing.sum()) for closing in halves.closing),
+            )
+        for chunk in range(0, len(level), SEAM_CHUNK):
+            yield from BidirectionalGenerator.join(
+                graph,
+                table,
+                level[chunk : chunk + SEAM_CHUNK],
+                halves,
+                pairing_rules,
+                limits,
+                bounds,
+            )
+
+    @staticmethod
+    def join(
+        graph: DutyGraph,
+        table: DutyTable,
+        level: np.ndarray,
+        halves: BackwardHalves,
+        pairing_rules: Sequence[ACPPairingRule],
+        limits: RootLimits,
+        bounds: ExtensionBounds,
+    ) -> Iterator[list[int]]:
+        """
+        Yields the valid pairings made of forward halves and backward halves,
+        by number of duties and then in the order of the forward halves.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties
+        table : DutyTable
+            The duties of `graph` as columns
+        level : np.ndarray
+            The duty indices of valid forward halves of the same length, one
+            row each
+        halves : BackwardHalves
+            The backward halves into the home bases of `graph`
+        limits : RootLimits
+            The home base and the horizon of the roots
+        bounds : ExtensionBounds
+            The limits of the pairing rules
+        """
+
+        # The seam: middle duties departing from the last arrival airport at
+        # the same home base, on a later day and after the minimum gap.
+        first = level[:, 0]
+        last = level[:, -1]
+        earliest = table.first_starts[table.days[last] + 1]
+        if bounds.min_gap is not None:
+            earliest = np.maximum(earliest, table.ends[last] + bounds.min_gap)
+        airports = limits.bases[first] * halves.num_airports + table.arrivals[last]
+        start = np.searchsorted(halves.keys, table.key(airports, earliest), "left")
+        stop = np.searchsorted(
+            halves.keys, table.key(airports, limits.latest[first]), "right"
+        )
+        rows, nodes = _expand(start, stop)
+        keep = table.days[halves.duties[0][nodes]] > table.days[last[rows]]
+
+        recorder = instrumentation.current()
+        paths = level
+        for depth in range(halves.max_length):
+            first = paths[rows, 0]
+            keep &= (halves.last_days[depth][nodes] <= limits.last_days[first]) & (
+                halves.last_starts[depth][nodes] <= limits.latest[first]
+            )
+            rows, nodes = rows[keep], nodes[keep]
+            candidates = halves.duties[depth][nodes]
+            if recorder is not None:
+                recorder.count("pairing_candidates", len(candidates))
+
+            batch = ExtensionBatch(
+                paths.shape[1],
+                table.starts[paths[rows, 0]],
+                table.ends[paths[rows, -1]],
+                table.starts[candidates],
+                table.ends[candidates],
+            )
+            valid = valid_pairing_joins(
+                batch,
+                lambda i: [graph.duties[index] for index in paths[rows[i]].tolist()],
+                lambda i: graph.duties[candidates[i]],
+                pairing_rules,
+            )
+            paths = np.column_stack([paths[rows[valid]], candidates[valid]]).astype(
+                np.int32
+            )
+            nodes = nodes[valid]
+            closed = paths[halves.closing[depth][nodes]]
+            for offset in range(0, len(closed), JOIN_CHUNK):
+                yield from closed[offset : offset + JOIN_CHUNK].tolist()
+            if recorder is not None and depth + 1 < halves.max_length:
+                recorder.count("pairing_partials", len(paths))
+
+            children = halves.children[depth]
+            rows, nodes = _expand(children[nodes], children[nodes + 1])
+            keep = np.ones(len(rows), dtype=bool)
+
+
+def _connections(
+    table: DutyTable, ordinals: np.ndarray, bounds: ExtensionBounds
+) -> tuple[np.ndarray, np.ndarray]:
+    # The duties and the duties they can be followed by within the bounds, the
+    # connections of `DutyGraph.successors_of`.
+    earliest = table.first_starts[table.days + 1]
+    if bounds.min_gap is not None:
+        earliest = np.maximum(earliest, table.ends + bounds.min_gap)
+    latest = np.full(len(table.days), table.starts.max(initial=0))
+    rows, successors = table.join(table.arrivals, earliest, latest)
+    keep = table.days[successors] > table.days[rows]
+    if bounds.max_days is not None:
+        keep &= ordinals[successors] - ordinals[rows] <= bounds.max_days
+    if bounds.max_elapsed is not None:
+        keep &= table.ends[successors] - table.starts[rows] <= bounds.max_elapsed
+    return rows[keep], successors[keep]
+
+
+def _expand(start: np.ndarray, stop: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # The row and the position of each entry of the ranges of the rows.
+    counts = np.maximum(stop - start, 0)
+    rows = np.repeat(np.arange(len(start)), counts)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return rows, np.repeat(start, counts) + offsets
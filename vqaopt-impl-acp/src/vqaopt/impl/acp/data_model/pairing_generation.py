@@ -1,7 +1,26 @@
-from typing import Sequence
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import timedelta
+from typing import Any, Iterator, Sequence
 
-from ..data_model import Duty, DutyContainer, Pairing
-from ..rule import ACPPairingRule, is_valid_pairing
+from ..data_model import Duty, DutyContainer, DutyGraph, Pairing
+from ..rule import (
+    ACPPairingRule,
+    AdaptiveRuleOrder,
+    ExtensionBatch,
+    ExtensionBounds,
+    is_valid_pairing,
+    is_valid_pairing_extension,
+    valid_pairing_extensions,
+)
+from ..utils import instrumentation
+from .duty_generation import MIN_BATCH
+from .reachability import Reachability
+
+# The number of roots per worker submitted ahead of the one whose pairings are
+# yielded next by `iter_paths`, which bounds the pairings held at once.
+ROOTS_IN_FLIGHT = 4
 
 
 class PairingGenerator:
@@ -11,43 +30,475 @@ class PairingGenerator:
 
     @staticmethod
     def generate_full_period(
-        duty_container: DutyContainer,
+        duty_container: DutyContainer | DutyGraph,
         pairing_rules: Sequence[ACPPairingRule],
+        workers: int = 1,
     ) -> list[Pairing]:
         """
         Generates valid pairings from multiple days of duty periods.
 
         Parameters
         ----------
-        duty_container : DutyContainer
-            The ordered list of daily duties to build pairings from
+        duty_container : DutyContainer | DutyGraph
+            The ordered list of daily duties to build pairings from,
+            or its connection graph built beforehand
+        workers : int, defaults to 1
+            The number of worker processes, see `generate_paths`
         """
 
-        pairings: list[Pairing] = []
-        to_expand: list[tuple[int, list[Duty]]] = [
-            (day, [duty])
-            for day, daily_duties in enumerate(duty_container)
-            for duty in daily_duties.duties
-            if is_valid_pairing([duty], pairing_rules)
+        graph = (
+            duty_container
+            if isinstance(duty_container, DutyGraph)
+            else DutyGraph(duty_container)
+        )
+        return [
+            Pairing([graph.duties[index] for index in path])
+            for path in PairingGenerator.generate_paths(graph, pairing_rules, workers)
         ]
-        for day, duties in to_expand:
-            if (
-                duties[0].departure_airport == duties[-1].arrival_airport
-                and duties[0].starts_at_home_base
+
+    @staticmethod
+    def generate_paths(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+        workers: int = 1,
+    ) -> list[list[int]]:
+        """
+        Generates valid pairings as lists of duty indices of a DutyGraph.
+
+        Pairings start with a duty at a home base, the search tree below each
+        such root duty is independent of the others. With more than one worker
+        the roots are partitioned by start day and home base and the parts are
+        expanded in a process pool, largest first. The result is the same as
+        the sequential one.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties to build pairings from
+        workers : int, defaults to 1
+            The number of worker processes, pairings are generated in this
+            process if 1.
+
+        Returns
+        ----------
+        list[list[int]]
+            The indices of the duties of each pairing in `graph.duties`.
+            Single-duty pairings come first in the order of their duties,
+            followed by the longer pairings of each root, last root first.
+        """
+
+        pairing_rules = AdaptiveRuleOrder.of(pairing_rules)
+        roots = PairingGenerator.roots(graph, pairing_rules)
+        paths = PairingGenerator.single_duty_paths(graph, roots)
+        reachability = PairingGenerator.reachability(graph, pairing_rules, roots)
+
+        if workers > 1 and len(roots) > 1:
+            expanded = _expand_in_parallel(
+                graph, pairing_rules, roots, workers, reachability
+            )
+        else:
+            expanded = {
+                root: PairingGenerator.expand_root(
+                    graph, root, pairing_rules, reachability
+                )
+                for root in roots
+            }
+
+        for root in reversed(roots):
+            paths.extend(expanded[root])
+        return paths
+
+    @staticmethod
+    def iter_paths(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+        workers: int = 1,
+    ) -> Iterator[list[int]]:
+        """
+        Yields valid pairings as lists of duty indices of a DutyGraph as soon
+        as they are found, in the order of `generate_paths`.
+
+        Only the current path of the search and the pending successors along
+        it are kept in memory, see `PairingSink` to collect the pairings. With
+        more than one worker the roots are expanded in a process pool in the
+        order their pairings are yielded, at most `ROOTS_IN_FLIGHT` per worker
+        at once, so only the pairings of those roots are kept in memory.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties to build pairings from
+        workers : int, defaults to 1
+            The number of worker processes, pairings are generated in this
+            process if 1.
+        """
+
+        pairing_rules = AdaptiveRuleOrder.of(pairing_rules)
+        roots = PairingGenerator.roots(graph, pairing_rules)
+        yield from PairingGenerator.single_duty_paths(graph, roots)
+        reachability = PairingGenerator.reachability(graph, pairing_rules, roots)
+        if workers > 1 and len(roots) > 1:
+            for paths in _iter_in_parallel(
+                graph, pairing_rules, roots[::-1], workers, reachability
             ):
-                pairings.append(Pairing(duties))
-
-        while len(to_expand) > 0:
-            day, duties = to_expand.pop()
-            for idx, daily_duties in enumerate(duty_container[day + 1 :]):
-                for duty in daily_duties.duties:
-                    if duties[-1].arrival_airport == duty.departure_airport:
-                        if is_valid_pairing([*duties, duty], pairing_rules):
-                            to_expand.append((day + idx + 1, [*duties, duty]))
-                        if (
-                            duties[0].departure_airport == duty.arrival_airport
-                            and duties[0].starts_at_home_base
-                        ):
-                            pairings.append(Pairing([*duties, duty]))
-
-        return pairings
+                yield from paths
+            return
+
+        for root in reversed(roots):
+            yield from PairingGenerator.iter_root(
+                graph, root, pairing_rules, reachability
+            )
+
+    @staticmethod
+    def roots(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+    ) -> list[int]:
+        """
+        Returns the indices of the duties pairings can start with, the valid
+        single-duty pairings starting at a home base.
+        """
+
+        return [
+            index
+            for index, duty in enumerate(graph.duties)
+            if duty.starts_at_home_base and is_valid_pairing([duty], pairing_rules)
+        ]
+
+    @staticmethod
+    def reachability(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+        roots: Sequence[int] | None = None,
+    ) -> Reachability:
+        """
+        Returns the reachability of the home bases in `graph`, bounded by the
+        minimum gap and the maximum days of the pairing rules.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties
+        roots : Sequence[int] | None, defaults to None
+            The `roots` of the graph if already known
+        """
+
+        bounds = ExtensionBounds.of(pairing_rules)
+        if roots is None:
+            roots = PairingGenerator.roots(graph, pairing_rules)
+        return Reachability(graph, roots, bounds.min_gap, bounds.max_days)
+
+    @staticmethod
+    def single_duty_paths(graph: DutyGraph, roots: Sequence[int]) -> list[list[int]]:
+        """
+        Returns the roots that are pairings on their own, ending where they start.
+        """
+
+        return [
+            [index]
+            for index in roots
+            if graph.duties[index].departure_airport
+            == graph.duties[index].arrival_airport
+        ]
+
+    @staticmethod
+    def horizon(
+        graph: DutyGraph, first: int, bounds: ExtensionBounds
+    ) -> tuple[int | None, int | None]:
+        """
+        Returns the last day and the latest start in minutes of the duties of
+        pairings starting with the duty `first` within `bounds`, None if
+        unbounded.
+        """
+
+        last_day = None
+        if bounds.max_days is not None:
+            last_day = (
+                bisect_right(
+                    graph.days,
+                    graph.days[graph.duty_days[first]]
+                    + timedelta(days=bounds.max_days),
+                )
+                - 1
+            )
+        latest = None
+        if bounds.max_elapsed is not None:
+            # Later duties could only end in time by ending before they start.
+            starts, _ = graph.minutes()
+            latest = (
+                int(starts[first])
+                + bounds.max_elapsed
+                - min(graph.shortest_duration(), 0)
+            )
+        return last_day, latest
+
+    @staticmethod
+    def valid_successors(
+        graph: DutyGraph,
+        path: list[int],
+        duties: list[Duty],
+        candidates: list[int],
+        pairing_rules: Sequence[ACPPairingRule],
+    ) -> list[int]:
+        """
+        Returns the candidates that are valid extensions of a partial pairing,
+        in their order. Many candidates are checked in a batch.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties
+        path : list[int]
+            The indices of the duties of the partial pairing
+        duties : list[Duty]
+            The duties of the partial pairing
+        candidates : list[int]
+            The indices of the duties that could extend it
+        """
+
+        if len(candidates) < MIN_BATCH:
+            return [
+                successor
+                for successor in candidates
+                if is_valid_pairing_extension(
+                    duties, graph.duties[successor], pairing_rules
+                )
+            ]
+
+        starts, ends = graph.minutes()
+        batch = ExtensionBatch(
+            len(path),
+            int(starts[path[0]]),
+            int(ends[path[-1]]),
+            starts[candidates],
+            ends[candidates],
+        )
+        mask = valid_pairing_extensions(
+            duties, batch, lambda i: graph.duties[candidates[i]], pairing_rules
+        )
+        return [
+            successor for successor, valid in zip(candidates, mask.tolist()) if valid
+        ]
+
+    @staticmethod
+    def expand_root(
+        graph: DutyGraph,
+        root: int,
+        pairing_rules: Sequence[ACPPairingRule],
+        reachability: Reachability | None = None,
+    ) -> list[list[int]]:
+        """
+        Generates the valid pairings of more than one duty starting with a duty,
+        in depth-first order.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties to build pairings from
+        root : int
+            The index of the first duty, a valid pairing on its own
+        reachability : Reachability | None, defaults to None
+            The reachability of the home bases in `graph`, partial pairings
+            that can not return to theirs in time are not expanded if given
+
+        Returns
+        ----------
+        list[list[int]]
+            The indices of the duties of each pairing in `graph.duties`.
+        """
+
+        return list(
+            PairingGenerator.iter_root(graph, root, pairing_rules, reachability)
+        )
+
+    @staticmethod
+    def iter_root(
+        graph: DutyGraph,
+        root: int,
+        pairing_rules: Sequence[ACPPairingRule],
+        reachability: Reachability | None = None,
+    ) -> Iterator[list[int]]:
+        """
+        Yields the pairings of `expand_root` one by one.
+
+        The successors of a path are all checked before the first of them is
+        expanded, so that pairings are found in the same order as with a stack
+        of partial paths. Only the valid successors still to expand are kept
+        for each duty of the current path.
+        """
+
+        first = graph.duties[root]
+        if not first.starts_at_home_base:
+            return
+
+        pairing_rules = AdaptiveRuleOrder.of(pairing_rules)
+        bounds = ExtensionBounds.of(pairing_rules)
+        last_day, latest = PairingGenerator.horizon(graph, root, bounds)
+        max_count = (
+            bounds.max_count if bounds.max_count is not None else len(graph.duties)
+        )
+        close_days = None
+        if reachability is not None:
+            close_days = reachability.close_column(reachability.base_of(root))
+            deadline = reachability.deadline(root)
+            if close_days[root] > deadline:
+                return
+
+        recorder = instrumentation.current()
+        path: list[int] = []
+        duties: list[Duty] = []
+        pending: list[list[int]] = []
+        index = root
+        while True:
+            path.append(index)
+            duties.append(graph.duties[index])
+
+            # Paths of the maximum count are not extended, the others only by
+            # the duties within the limits of the rules.
+            candidates = (
+                [
+                    successor
+                    for _, successor in graph.successors_of(
+                        index, last_day, bounds.min_gap, latest
+                    )
+                ]
+                if len(path) < max_count
+                else []
+            )
+            if close_days is not None:
+                # Duties that can not return to the home base in time would
+                # only start paths that never close.
+                candidates = [
+                    successor
+                    for successor in candidates
+                    if close_days[successor] <= deadline
+                ]
+            successors = PairingGenerator.valid_successors(
+                graph, path, duties, candidates, pairing_rules
+            )
+            for successor in successors:
+                if first.departure_airport == graph.duties[successor].arrival_airport:
+                    yield [*path, successor]
+            pending.append(successors)
+            if recorder is not None:
+                recorder.count("pairing_expansions")
+                recorder.count("pairing_candidates", len(candidates))
+
+            while pending and not pending[-1]:
+                pending.pop()
+                path.pop()
+                duties.pop()
+            if not pending:
+                return
+            index = pending[-1].pop()
+
+
+_worker_graph: DutyGraph | None = None
+_worker_rules: Sequence[ACPPairingRule] = ()
+_worker_reachability: Reachability | None = None
+_worker_record = False
+
+
+def _init_worker(
+    graph: DutyGraph,
+    pairing_rules: Sequence[ACPPairingRule],
+    reachability: Reachability | None,
+    record: bool,
+) -> None:
+    global _worker_graph, _worker_rules, _worker_reachability, _worker_record
+    _worker_graph = graph
+    _worker_rules = pairing_rules
+    _worker_reachability = reachability
+    _worker_record = record
+
+
+def _expand_roots(
+    roots: list[int],
+) -> tuple[list[list[list[int]]], dict[str, Any] | None]:
+    # Runs in a worker process, the graph is sent once per worker. Returns what
+    # was recorded for the parent process to merge.
+    assert _worker_graph is not None
+    graph = _worker_graph
+    if not _worker_record:
+        return [
+            PairingGenerator.expand_root(
+                graph, root, _worker_rules, _worker_reachability
+            )
+            for root in roots
+        ], None
+    with instrumentation.record() as recorder:
+        expanded = [
+            PairingGenerator.expand_root(
+                graph, root, _worker_rules, _worker_reachability
+            )
+            for root in roots
+        ]
+    return expanded, recorder.to_dict()
+
+
+def _expand_in_parallel(
+    graph: DutyGraph,
+    pairing_rules: Sequence[ACPPairingRule],
+    roots: list[int],
+    workers: int,
+    reachability: Reachability | None = None,
+) -> dict[int, list[list[int]]]:
+    parts: dict[tuple[int, str], list[int]] = {}
+    for root in roots:
+        parts.setdefault(
+            (graph.duty_days[root], graph.duties[root].departure_airport), []
+        ).append(root)
+
+    # Roots of earlier days have more days left to extend into, submitting the
+    # largest estimates first keeps the workers busy until the end.
+    ordered = sorted(
+        parts.items(),
+        key=lambda item: (-len(item[1]) * (graph.num_days - item[0][0]), item[0]),
+    )
+
+    recorder = instrumentation.current()
+    expanded: dict[int, list[list[int]]] = {}
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(ordered)),
+        initializer=_init_worker,
+        initargs=(graph, pairing_rules, reachability, recorder is not None),
+    ) as pool:
+        futures = [(part, pool.submit(_expand_roots, part)) for _, part in ordered]
+        for part, future in futures:
+            paths, recorded = future.result()
+            expanded.update(zip(part, paths))
+            if recorder is not None and recorded is not None:
+                recorder.merge(recorded)
+    return expanded
+
+
+def _iter_in_parallel(
+    graph: DutyGraph,
+    pairing_rules: Sequence[ACPPairingRule],
+    roots: list[int],
+    workers: int,
+    reachability: Reachability | None = None,
+) -> Iterator[list[list[int]]]:
+    # Yields the pairings of each root in the given order. Roots are submitted
+    # one by one in that order, the results of those done early wait in their
+    # futures until it is their turn.
+    recorder = instrumentation.current()
+
+    def collect(future: Future) -> list[list[int]]:
+        (paths,), recorded = future.result()
+        if recorder is not None and recorded is not None:
+            recorder.merge(recorded)
+        return paths
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(roots)),
+        initializer=_init_worker,
+        initargs=(graph, pairing_rules, reachability, recorder is not None),
+    ) as pool:
+        futures: deque[Future] = deque()
+        for root in roots:
+            futures.append(pool.submit(_expand_roots, [root]))
+            if len(futures) == ROOTS_IN_FLIGHT * workers:
+                yield collect(futures.popleft())
+        while futures:
+            yield collect(futures.popleft())
@@ -0,0 +1,359 @@
+"""
+Level-wise pairing construction by joins over columnar duty tables
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterator, Sequence
+
+import numpy as np
+
+from ..data_model import DutyGraph
+from ..rule import (
+    ACPPairingRule,
+    AdaptiveRuleOrder,
+    ExtensionBatch,
+    ExtensionBounds,
+    valid_pairing_joins,
+)
+from ..utils import instrumentation
+from .pairing_generation import PairingGenerator
+from .reachability import Reachability
+
+# The number of partial pairings joined at once, which bounds the memory of
+# the candidate columns of a join.
+JOIN_CHUNK = 1 << 16
+
+_UNBOUNDED = np.iinfo(np.int64)
+
+
+@dataclass
+class DutyTable:
+    """
+    The duties of a DutyGraph as columns, indexed like `DutyGraph.duties`.
+
+    Airports are numbered in the order of their codes, times are minutes since
+    the epoch of the leg table, see `DutyGraph.minutes`.
+
+    Fields
+    ----------
+    `days` : np.ndarray
+        The index of the day of each duty
+    `starts` : np.ndarray
+        The start time of each duty
+    `ends` : np.ndarray
+        The end time of each duty
+    `departures` : np.ndarray
+        The number of the departure airport of each duty
+    `arrivals` : np.ndarray
+        The number of the arrival airport of each duty
+    `order` : np.ndarray
+        The duties sorted by departure airport and start time
+    `keys` : np.ndarray
+        The departure airport and the start time of the duties in `order` as
+        one sorted key, see `key`
+    `first_starts` : np.ndarray
+        The earliest start of the duties of each day or a later one, indexed
+        by day up to the number of days
+    `last_starts` : np.ndarray
+        The latest start of the duties of each day or an earlier one
+    """
+
+    days: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    departures: np.ndarray
+    arrivals: np.ndarray
+    order: np.ndarray
+    keys: np.ndarray
+    first_starts: np.ndarray
+    last_starts: np.ndarray
+
+    @classmethod
+    def of(cls, graph: DutyGraph) -> DutyTable:
+        """
+        Creates the table of the duties of a graph.
+        """
+
+        starts, ends = graph.minutes()
+        days = np.asarray(graph.duty_days, dtype=np.int64)
+        first_starts = np.full(graph.num_days + 1, _UNBOUNDED.max // 2)
+        last_starts = np.full(graph.num_days, _UNBOUNDED.min // 2)
+        np.minimum.at(first_starts, days, starts)
+        np.maximum.at(last_starts, days, starts)
+        _, numbers = np.unique(
+            [duty.departure_airport for duty in graph.duties]
+            + [duty.arrival_airport for duty in graph.duties],
+            return_inverse=True,
+        )
+        departures = numbers[: len(graph.duties)].astype(np.int64)
+        arrivals = numbers[len(graph.duties) :].astype(np.int64)
+        table = cls(
+            days=days,
+            starts=starts,
+            ends=ends,
+            departures=departures,
+            arrivals=arrivals,
+            order=np.lexsort((np.arange(len(starts)), starts, departures)),
+            keys=np.empty(0, dtype=np.int64),
+            first_starts=np.minimum.accumulate(first_starts[::-1])[::-1],
+            last_starts=np.maximum.accumulate(last_starts),
+        )
+        table.keys = table.key(departures, starts)[table.order]
+        return table
+
+    def key(self, airports: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """
+        Returns the sort keys of departures from `airports` at `times`. Times
+        outside those of the duties are clipped, so that the keys of an
+        airport stay within its own range.
+        """
+
+        if len(self.starts) == 0:
+            return np.zeros(len(airports), dtype=np.int64)
+        first = int(self.starts.min())
+        span = int(self.starts.max()) - first + 2
+        return airports * span + np.clip(times - first, -1, span - 1) + 1
+
+    def join(
+        self,
+        airports: np.ndarray,
+        earliest: np.ndarray,
+        latest: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Joins rows of arrivals with the duties departing from their airport
+        within a window of start times.
+
+        Parameters
+        ----------
+        `airports` : np.ndarray
+            The number of the airport of each row
+        `earliest` : np.ndarray
+            The earliest start time of each row
+        `latest` : np.ndarray
+            The latest start time of each row
+
+        Returns
+        ----------
+        tuple[np.ndarray, np.ndarray]
+            The row and the index of the duty of each match, by row and in the
+            order of `keys` within a row.
+        """
+
+        start = np.searchsorted(self.keys, self.key(airports, earliest), "left")
+        stop = np.searchsorted(self.keys, self.key(airports, latest), "right")
+        counts = np.maximum(stop - start, 0)
+
+        rows = np.repeat(np.arange(len(airports)), counts)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return rows, self.order[np.repeat(start, counts) + offsets]
+
+
+class JoinGenerator:
+    """
+    Pairing generator building all pairings of the same number of duties at
+    once.
+
+    The partial pairings of k duties are kept as a matrix of duty indices, one
+    row each. The next level joins their last duties with the duties departing
+    from the same airport on a later day, after the minimum gap and within the
+    maximum days and elapsed time of the rules, see `DutyTable.join`. The
+    candidates that can not return to their home base in time, see
+    `Reachability`, are dropped. The rest is checked with the join forms of
+    the rules, see `ACPRule.is_valid_join_batch`, and one by one with the
+    rules that have none. The valid extensions form the next level, those
+    arriving at their home base are pairings.
+
+    The pairings are the ones of `PairingGenerator.generate_paths`, ordered by
+    number of duties instead.
+    """
+
+    @staticmethod
+    def generate_paths(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+    ) -> list[list[int]]:
+        """
+        Generates valid pairings as lists of duty indices of a DutyGraph.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties to build pairings from
+
+        Returns
+        ----------
+        list[list[int]]
+            The indices of the duties of each pairing in `graph.duties`, see
+            `iter_paths`.
+        """
+
+        return list(JoinGenerator.iter_paths(graph, pairing_rules))
+
+    @staticmethod
+    def iter_paths(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+    ) -> Iterator[list[int]]:
+        """
+        Yields valid pairings as lists of duty indices of a DutyGraph, level
+        by level.
+
+        Single-duty pairings come first in the order of their duties, followed
+        by the pairings of each number of duties. Only the partial pairings of
+        the current and the next level are kept in memory.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties to build pairings from
+        """
+
+        pairing_rules = AdaptiveRuleOrder.of(pairing_rules)
+        bounds = ExtensionBounds.of(pairing_rules)
+        roots = PairingGenerator.roots(graph, pairing_rules)
+        yield from PairingGenerator.single_duty_paths(graph, roots)
+        reachability = PairingGenerator.reachability(graph, pairing_rules, roots)
+        table = DutyTable.of(graph)
+        limits = RootLimits.of(graph, table, roots, reachability, bounds)
+
+        recorder = instrumentation.current()
+        level = np.asarray(
+            [
+                [root]
+                for root in roots
+                if reachability.close_days[root, limits.bases[root]]
+                <= limits.deadlines[root]
+            ],
+            dtype=np.int32,
+        ).reshape(-1, 1)
+        length = 1
+        while len(level) and (bounds.max_count is None or length < bounds.max_count):
+            if recorder is not None:
+                recorder.count("pairing_partials", len(level))
+            extended = []
+            for chunk in range(0, len(level), JOIN_CHUNK):
+                joined = JoinGenerator.join(
+                    graph,
+                    table,
+                    level[chunk : chunk + JOIN_CHUNK],
+                    pairing_rules,
+                    reachability,
+                    limits,
+                    bounds,
+                )
+                closing = (
+                    table.arrivals[joined[:, -1]] == table.departures[joined[:, 0]]
+                )
+                yield from joined[closing].tolist()
+                extended.append(joined)
+            level = np.concatenate(extended)
+            length += 1
+
+    @staticmethod
+    def join(
+        graph: DutyGraph,
+        table: DutyTable,
+        level: np.ndarray,
+        pairing_rules: Sequence[ACPPairingRule],
+        reachability: Reachability,
+        limits: RootLimits,
+        bounds: ExtensionBounds,
+    ) -> np.ndarray:
+        """
+        Returns the valid extensions of partial pairings by one duty, in the
+        order of the partial pairings and then of `DutyTable.keys`.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties
+        table : DutyTable
+            The duties of `graph` as columns
+        level : np.ndarray
+            The duty indices of valid partial pairings of the same length,
+            one row each
+        reachability : Reachability
+            The reachability of the home bases in `graph`
+        bounds : ExtensionBounds
+            The limits of the pairing rules
+        """
+
+        # Successors start on a later day, after the minimum gap, and before
+        # the end of the horizon of the root.
+        first = level[:, 0]
+        last = level[:, -1]
+        earliest = table.first_starts[table.days[last] + 1]
+        if bounds.min_gap is not None:
+            earliest = np.maximum(earliest, table.ends[last] + bounds.min_gap)
+        rows, candidates = table.join(
+            table.arrivals[last], earliest, limits.latest[first]
+        )
+
+        first = first[rows]
+        last = last[rows]
+        keep = (table.days[candidates] > table.days[last]) & (
+            table.days[candidates] <= limits.last_days[first]
+        )
+        keep &= (
+            reachability.close_days[candidates, limits.bases[first]]
+            <= limits.deadlines[first]
+        )
+        rows, candidates = rows[keep], candidates[keep]
+        recorder = instrumentation.current()
+        if recorder is not None:
+            recorder.count("pairing_candidates", len(candidates))
+
+        batch = ExtensionBatch(
+            level.shape[1],
+            table.starts[level[rows, 0]],
+            table.ends[level[rows, -1]],
+            table.starts[candidates],
+            table.ends[candidates],
+        )
+        valid = valid_pairing_joins(
+            batch,
+            lambda i: [graph.duties[index] for index in level[rows[i]].tolist()],
+            lambda i: graph.duties[candidates[i]],
+            pairing_rules,
+        )
+        return np.column_stack([level[rows[valid]], candidates[valid]]).astype(np.int32)
+
+
+@dataclass
+class RootLimits:
+    # The home base, the horizon and the deadline of the pairings starting
+    # with each root, indexed by duty.
+    bases: np.ndarray
+    last_days: np.ndarray
+    latest: np.ndarray
+    deadlines: np.ndarray
+
+    @classmethod
+    def of(
+        cls,
+        graph: DutyGraph,
+        table: DutyTable,
+        roots: Sequence[int],
+        reachability: Reachability,
+        bounds: ExtensionBounds,
+    ) -> RootLimits:
+        num_duties = len(graph.duties)
+        limits = cls(
+            bases=np.zeros(num_duties, dtype=np.int64),
+            last_days=np.full(num_duties, graph.num_days - 1, dtype=np.int64),
+            latest=np.zeros(num_duties, dtype=np.int64),
+            deadlines=np.zeros(num_duties, dtype=np.int64),
+        )
+        for root in roots:
+            last_day, latest = PairingGenerator.horizon(graph, root, bounds)
+            limits.bases[root] = reachability.base_of(root)
+            if last_day is not None:
+                limits.last_days[root] = last_day
+            limits.latest[root] = table.last_starts[limits.last_days[root]]
+            if latest is not None:
+                limits.latest[root] = min(limits.latest[root], latest)
+            limits.deadlines[root] = reachability.deadline(root)
+        return limits
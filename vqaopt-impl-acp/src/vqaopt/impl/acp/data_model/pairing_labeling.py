@@ -0,0 +1,294 @@
+"""
+Resource-constrained labeling over the duty connection graph
+"""
+
+import heapq
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+from ..cost_model import ACPCostModel
+from ..data_model import Duty, DutyGraph, Leg, Pairing
+from ..rule import (
+    ACPPairingRule,
+    AdaptiveRuleOrder,
+    ExtensionBounds,
+    is_valid_pairing,
+    is_valid_pairing_extension,
+)
+from .pairing_generation import PairingGenerator
+
+
+@dataclass
+class Label:
+    """
+    A partial pairing ending at a duty of the graph.
+
+    Fields
+    ----------
+    `path` : list[int]
+        The indices of the duties of the partial pairing
+    `cost` : float
+        The cost of the partial pairing as a pairing of its own, less the
+        prices of its duties when pricing
+    `num_duties` : int
+        The number of duties used
+    `elapsed_days` : int
+        The number of days between the first and the last duty
+    `protected_below` : float
+        The label is kept while its cost does not exceed this bound, because a
+        leg it covers may still need it
+    """
+
+    path: list[int]
+    cost: float
+    num_duties: int
+    elapsed_days: int
+    protected_below: float = -np.inf
+
+
+class PairingLabeler:
+    """
+    Pairing generator based on resource-constrained labeling.
+
+    Every valid partial pairing starting at a home base is a label at its last
+    duty. The resources of a label are its number of duties, its elapsed days
+    and its rest: the rest before the next duty only depends on the last duty,
+    which all labels at the same duty share. Duties are processed in the order
+    of the graph, so all labels of a duty are known before it is extended.
+
+    Among the labels of a duty with the same home base, a label is dominated by
+    another one that is at most as expensive and uses at most as many duties
+    and days, and is better in one of them. Dominated labels are discarded
+    together with their extensions. This assumes that the pairing rules only
+    get stricter with more duties and days, like `MaxDuties`, `MinRest` and
+    `MaxPairingDuration`, and that the cost of an extension does not depend on
+    the duties before the last one, like in `ACPCostExample`.
+    """
+
+    @staticmethod
+    def generate_paths(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+        cost_model: ACPCostModel,
+        k: int = 0,
+    ) -> list[list[int]]:
+        """
+        Generates pairings as lists of duty indices of a DutyGraph.
+
+        Parameters
+        ----------
+        graph : DutyGraph
+            The connection graph of the duties to build pairings from
+        pairing_rules : Sequence[ACPPairingRule]
+            The rules every pairing has to satisfy
+        cost_model : ACPCostModel
+            The cost model to compare labels with
+        k : int, defaults to 0
+            If 0, all pairings of non-dominated labels are returned. Otherwise
+            labels are only discarded once `k` other labels dominate them, and
+            of the resulting pairings the `k` cheapest of each leg are kept.
+
+        Returns
+        ----------
+        list[list[int]]
+            The indices of the duties of each pairing in `graph.duties`,
+            ordered by last duty, then by cost.
+        """
+
+        costs: dict[tuple[int, ...], float] = {}
+        closed = PairingLabeler.label(
+            graph, pairing_rules, cost_model, max(k, 1), costs=costs
+        )
+        if k > 0:
+            # Labels dominated after passing a leg do not leave cheaper
+            # alternatives for that leg. A second pass protects the labels that
+            # are no more expensive than the k cheapest pairings found per leg.
+            bounds = PairingLabeler.kth_cost_per_leg(graph, closed, k)
+            closed = PairingLabeler.label(
+                graph, pairing_rules, cost_model, k, bounds, costs
+            )
+            closed = PairingLabeler.cheapest_per_leg(graph, closed, k)
+        return [label.path for label in closed]
+
+    @staticmethod
+    def label(
+        graph: DutyGraph,
+        pairing_rules: Sequence[ACPPairingRule],
+        cost_model: ACPCostModel,
+        k: int = 1,
+        bounds: dict[Leg, float] | None = None,
+        costs: dict[tuple[int, ...], float] | None = None,
+        duty_prices: Sequence[float] | None = None,
+    ) -> list[Label]:
+        """
+        Runs the labeling and returns the labels that close a pairing.
+
+        Parameters
+        ----------
+        k : int, defaults to 1
+            The number of labels that have to dominate a label to discard it
+        bounds : dict[Leg, float] | None, defaults to None
+            Labels covering a leg are protected from being discarded up to the
+            cost bound of the leg, no label is protected if None
+        costs : dict[tuple[int, ...], float] | None, defaults to None
+            The costs of partial pairings by duty indices, read and filled
+            to share them between runs
+        duty_prices : Sequence[float] | None, defaults to None
+            Prices of the duties subtracted from the cost of the labels using
+            them, the costs of the labels are reduced costs if given
+        """
+
+        if costs is None:
+            costs = {}
+        pairing_rules = AdaptiveRuleOrder.of(pairing_rules)
+        extension_bounds = ExtensionBounds.of(pairing_rules)
+
+        def cost_of(path: list[int]) -> float:
+            key = tuple(path)
+            if key not in costs:
+                costs[key] = cost_model.cost(Pairing([graph.duties[i] for i in path]))
+            if duty_prices is None:
+                return costs[key]
+            return costs[key] - sum(duty_prices[i] for i in path)
+
+        def protected_below(label: Label, duty: Duty) -> float:
+            if bounds is None:
+                return -np.inf
+            return max(
+                label.protected_below,
+                max(bounds.get(leg, np.inf) for leg in duty.legs),
+            )
+
+        buckets: list[list[Label]] = [[] for _ in graph.duties]
+        for index, duty in enumerate(graph.duties):
+            if duty.starts_at_home_base and is_valid_pairing([duty], pairing_rules):
+                label = Label([index], cost_of([index]), 1, 0)
+                label.protected_below = protected_below(label, duty)
+                buckets[index].append(label)
+
+        closed: list[Label] = []
+        for index, duty in enumerate(graph.duties):
+            labels = PairingLabeler.filter_dominated(graph, buckets[index], k)
+            buckets[index] = []
+
+            for label in labels:
+                first = graph.duties[label.path[0]]
+                if first.departure_airport == duty.arrival_airport:
+                    closed.append(label)
+
+                if (
+                    extension_bounds.max_count is not None
+                    and label.num_duties >= extension_bounds.max_count
+                ):
+                    continue
+                duties = [graph.duties[i] for i in label.path]
+                last_day, latest = PairingGenerator.horizon(
+                    graph, label.path[0], extension_bounds
+                )
+                for day, successor in graph.successors_of(
+                    index, last_day, extension_bounds.min_gap, latest
+                ):
+                    next_duty = graph.duties[successor]
+                    if not is_valid_pairing_extension(duties, next_duty, pairing_rules):
+                        continue
+                    path = [*label.path, successor]
+                    extended = Label(
+                        path,
+                        cost_of(path),
+                        label.num_duties + 1,
+                        day - graph.duty_days[label.path[0]],
+                        label.protected_below,
+                    )
+                    extended.protected_below = protected_below(extended, next_duty)
+                    buckets[successor].append(extended)
+
+        return closed
+
+    @staticmethod
+    def filter_dominated(
+        graph: DutyGraph, labels: Sequence[Label], k: int = 1
+    ) -> list[Label]:
+        """
+        Returns the labels dominated by fewer than `k` labels with the same
+        home base or protected by their cost, ordered by cost.
+        """
+
+        labels = sorted(labels, key=lambda label: (label.cost, label.path))
+        if len(labels) <= k:
+            return labels
+
+        home_bases = [graph.duties[label.path[0]].departure_airport for label in labels]
+        costs = np.array([label.cost for label in labels])
+        num_duties = np.array([label.num_duties for label in labels])
+        elapsed_days = np.array([label.elapsed_days for label in labels])
+
+        kept = []
+        for base in dict.fromkeys(home_bases):
+            group = np.array(
+                [i for i, home_base in enumerate(home_bases) if home_base == base]
+            )
+            cost, count, days = costs[group], num_duties[group], elapsed_days[group]
+            for i in group.tolist():
+                at_most = (
+                    (cost <= costs[i])
+                    & (count <= num_duties[i])
+                    & (days <= elapsed_days[i])
+                )
+                better = (
+                    (cost < costs[i])
+                    | (count < num_duties[i])
+                    | (days < elapsed_days[i])
+                )
+                if (
+                    np.count_nonzero(at_most & better) < k
+                    or costs[i] <= labels[i].protected_below
+                ):
+                    kept.append(i)
+
+        return [labels[i] for i in sorted(kept)]
+
+    @staticmethod
+    def kth_cost_per_leg(
+        graph: DutyGraph, labels: Sequence[Label], k: int
+    ) -> dict[Leg, float]:
+        """
+        Returns the cost of the `k`-th cheapest label of each leg covered by
+        at least `k` labels.
+        """
+
+        costs: dict[Leg, list[float]] = {}
+        for label in labels:
+            for index in label.path:
+                for leg in graph.duties[index].legs:
+                    costs.setdefault(leg, []).append(label.cost)
+
+        return {
+            leg: heapq.nsmallest(k, leg_costs)[-1]
+            for leg, leg_costs in costs.items()
+            if len(leg_costs) >= k
+        }
+
+    @staticmethod
+    def cheapest_per_leg(
+        graph: DutyGraph, labels: Sequence[Label], k: int
+    ) -> list[Label]:
+        """
+        Returns the labels among the `k` cheapest of any of their legs,
+        in their original order.
+        """
+
+        cheapest: dict[Leg, list[tuple[float, int]]] = {}
+        for position, label in enumerate(labels):
+            for index in label.path:
+                for leg in graph.duties[index].legs:
+                    heap = cheapest.setdefault(leg, [])
+                    entry = (-label.cost, -position)
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+
+        selected = {-position for heap in cheapest.values() for _, position in heap}
+        return [label for position, label in enumerate(labels) if position in selected]
@@ -0,0 +1,404 @@
+"""
+Compact storage of generated pairings
+"""
+
+from __future__ import annotations
+
+import typing
+
+import numpy as np
+
+from .duty import Duty
+from .duty_graph import DutyGraph
+from .leg_table import LegTable
+from .pairing import Pairing
+
+
+def _offsets(lengths: typing.Iterable[int]) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(np.fromiter(lengths, dtype=np.int64))])
+
+
+class PairingPool(typing.Sequence[Pairing]):
+    """
+    A read-only sequence of pairings stored as flat index arrays.
+
+    Duties are stored as offsets into a flat array of LegTable rows, pairings
+    as offsets into a flat array of duty indices, both identified by their
+    position. Pairing and Duty objects are only created as views on access,
+    the id of a pairing view is its index in the pool.
+
+    Fields
+    ----------
+    `table` : LegTable
+        The legs the duties refer to
+    `duty_offsets` : np.ndarray
+        Duty `d` consists of the rows `duty_legs[duty_offsets[d]:duty_offsets[d + 1]]`
+    `duty_legs` : np.ndarray
+        The table rows of the legs of all duties
+    `pairing_offsets` : np.ndarray
+        Pairing `p` consists of the duties
+        `pairing_duties[pairing_offsets[p]:pairing_offsets[p + 1]]`
+    `pairing_duties` : np.ndarray
+        The duty indices of all pairings
+    """
+
+    table: LegTable
+    duty_offsets: np.ndarray
+    duty_legs: np.ndarray
+    pairing_offsets: np.ndarray
+    pairing_duties: np.ndarray
+
+    def __init__(
+        self,
+        table: LegTable,
+        duty_offsets: np.ndarray,
+        duty_legs: np.ndarray,
+        pairing_offsets: np.ndarray,
+        pairing_duties: np.ndarray,
+    ) -> None:
+        self.table = table
+        self.duty_offsets = np.asarray(duty_offsets, dtype=np.int64)
+        self.duty_legs = np.asarray(duty_legs, dtype=np.int32)
+        self.pairing_offsets = np.asarray(pairing_offsets, dtype=np.int64)
+        self.pairing_duties = np.asarray(pairing_duties, dtype=np.int32)
+        self._duties: dict[int, Duty] = {}
+
+    @classmethod
+    def from_graph(
+        cls,
+        table: LegTable,
+        graph: DutyGraph,
+        paths: typing.Iterable[typing.Sequence[int]],
+    ) -> PairingPool:
+        """
+        Creates a pool from pairings given as duty indices of a DutyGraph.
+
+        Parameters
+        ----------
+        `table` : LegTable
+            The table holding the legs of the duties
+        `graph` : DutyGraph
+            The graph the duty indices refer to
+        `paths` : Iterable[Sequence[int]]
+            The duty indices of each pairing, see `PairingGenerator.generate_paths`
+        """
+
+        duty_arrays = graph.to_arrays(table)
+        paths = list(paths)
+        return cls(
+            table,
+            duty_arrays["duty_offsets"],
+            duty_arrays["duty_legs"],
+            _offsets(len(path) for path in paths),
+            np.fromiter(
+                (index for path in paths for index in path),
+                dtype=np.int32,
+                count=sum(len(path) for path in paths),
+            ),
+        )
+
+    @classmethod
+    def from_pairings(
+        cls, table: LegTable, pairings: typing.Iterable[Pairing]
+    ) -> PairingPool:
+        """
+        Creates a pool from Pairing objects, storing equal duties once.
+        """
+
+        duty_index: dict[Duty, int] = {}
+        duty_legs: list[list[int]] = []
+        paths: list[list[int]] = []
+        for pairing in pairings:
+            path = []
+            for duty in pairing.duties:
+                if duty not in duty_index:
+                    duty_index[duty] = len(duty_legs)
+                    duty_legs.append(table.rows(duty.legs))
+                path.append(duty_index[duty])
+            paths.append(path)
+
+        return cls(
+            table,
+            _offsets(len(rows) for rows in duty_legs),
+            np.array([row for rows in duty_legs for row in rows], dtype=np.int32),
+            _offsets(len(path) for path in paths),
+            np.array([index for path in paths for index in path], dtype=np.int32),
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, table: LegTable, arrays: typing.Mapping[str, np.ndarray]
+    ) -> PairingPool:
+        """
+        Creates a pool from the arrays returned by `to_arrays`.
+        """
+
+        return cls(
+            table,
+            arrays["duty_offsets"],
+            arrays["duty_legs"],
+            arrays["pairing_offsets"],
+            arrays["pairing_duties"],
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """
+        Returns the index arrays of the pool by name, see `from_arrays`.
+        """
+
+        return {
+            "duty_offsets": self.duty_offsets,
+            "duty_legs": self.duty_legs,
+            "pairing_offsets": self.pairing_offsets,
+            "pairing_duties": self.pairing_duties,
+        }
+
+    @property
+    def num_duties(self) -> int:
+        """
+        Returns the number of duties stored in the pool.
+        """
+
+        return len(self.duty_offsets) - 1
+
+    def __len__(self) -> int:
+        return len(self.pairing_offsets) - 1
+
+    @typing.overload
+    def __getitem__(self, index: int) -> Pairing: ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> list[Pairing]: ...
+
+    def __getitem__(self, index: int | slice) -> Pairing | list[Pairing]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("pairing index out of range")
+
+        pairing = Pairing([self.duty(int(d)) for d in self.duty_indices(index)])
+        pairing.id = index
+        return pairing
+
+    def subset(self, indices: typing.Sequence[int] | np.ndarray) -> PairingPool:
+        """
+        Returns a pool of the pairings at `indices`, in that order, sharing the
+        duties of this pool.
+        """
+
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.pairing_offsets[indices]
+        lengths = self.pairing_offsets[indices + 1] - starts
+        offsets = _offsets(lengths)
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return PairingPool(
+            self.table,
+            self.duty_offsets,
+            self.duty_legs,
+            offsets,
+            self.pairing_duties[positions],
+        )
+
+    def duty_indices(self, index: int) -> np.ndarray:
+        """
+        Returns the duty indices of a pairing.
+        """
+
+        return self.pairing_duties[
+            self.pairing_offsets[index] : self.pairing_offsets[index + 1]
+        ]
+
+    def key(self, index: int) -> tuple[int, ...]:
+        """
+        Returns the canonical key of a pairing, the table rows of its legs.
+
+        Pairings of the same pool are equal if and only if their keys are.
+        """
+
+        rows = [
+            self.duty_legs[self.duty_offsets[d] : self.duty_offsets[d + 1]]
+            for d in self.duty_indices(index)
+        ]
+        return tuple(np.concatenate(rows).tolist())
+
+    def duty(self, index: int) -> Duty:
+        """
+        Returns a view of a duty, created on first access.
+        """
+
+        duty = self._duties.get(index)
+        if duty is None:
+            duty = Duty(
+                self.table.legs(
+                    self.duty_legs[
+                        self.duty_offsets[index] : self.duty_offsets[index + 1]
+                    ]
+                )
+            )
+            duty.id = index
+            self._duties[index] = duty
+        return duty
+
+    def leg_incidence(
+        self, start: int = 0, stop: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the incidence of pairings and legs as coordinate arrays,
+        without creating any views.
+
+        Parameters
+        ----------
+        `start` : int, defaults to 0
+            The first pairing to include
+        `stop` : int | None, defaults to None
+            The pairing to stop before, the end of the pool if None
+
+        Returns
+        ----------
+        tuple[np.ndarray, np.ndarray]
+            The pairing indices and the table rows of the nonzero entries,
+            ordered by pairing.
+        """
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+        pairing_offsets = self.pairing_offsets[start : stop + 1]
+        pairing_duties = self.pairing_duties[pairing_offsets[0] : pairing_offsets[-1]]
+
+        duty_lengths = np.diff(self.duty_offsets)[pairing_duties]
+        entry_starts = np.repeat(
+            self.duty_offsets[pairing_duties] - _offsets(duty_lengths)[:-1],
+            duty_lengths,
+        )
+        leg_rows = self.duty_legs[entry_starts + np.arange(len(entry_starts))]
+
+        pairing_lengths = np.add.reduceat(
+            duty_lengths, pairing_offsets[:-1] - pairing_offsets[0]
+        )
+        pairing_indices = np.repeat(np.arange(start, stop), pairing_lengths)
+        return pairing_indices.astype(np.intp), leg_rows.astype(np.intp)
+
+
+class PairingSink:
+    """
+    Writes pairings given as duty indices of a DutyGraph to binary files,
+    buffering at most `chunk_size` pairings in memory.
+
+    The duty indices of all pairings are appended to `<path>.duties` and the
+    number of duties of each pairing to `<path>.lengths`, both as raw int32.
+    After `close`, `to_pool` maps the files back as a PairingPool without
+    reading them into memory.
+    """
+
+    path: str
+    chunk_size: int
+
+    def __init__(self, path: str, chunk_size: int = 1 << 16) -> None:
+        """
+        Parameters
+        ----------
+        `path` : str
+            The common path of the files, existing files are overwritten
+        `chunk_size` : int, defaults to 65536
+            The number of pairings to buffer before writing them out
+        """
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self._duties = open(f"{path}.duties", "wb")
+        self._lengths = open(f"{path}.lengths", "wb")
+        self._buffer: list[typing.Sequence[int]] = []
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> PairingSink:
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        self.close()
+
+    def add(self, path: typing.Sequence[int]) -> None:
+        """
+        Adds a pairing given as the duty indices of a DutyGraph.
+        """
+
+        self._buffer.append(path)
+        self._count += 1
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, paths: typing.Iterable[typing.Sequence[int]]) -> None:
+        """
+        Adds pairings, consuming `paths` lazily.
+        """
+
+        for path in paths:
+            self.add(path)
+
+    def flush(self) -> None:
+        """
+        Writes the buffered pairings to the files.
+        """
+
+        if not self._buffer:
+            return
+
+        lengths = np.fromiter(
+            (len(path) for path in self._buffer),
+            dtype=np.int32,
+            count=len(self._buffer),
+        )
+        np.fromiter(
+            (index for path in self._buffer for index in path),
+            dtype=np.int32,
+            count=int(lengths.sum()),
+        ).tofile(self._duties)
+        lengths.tofile(self._lengths)
+        self._buffer = []
+
+    def close(self) -> None:
+        """
+        Writes the remaining pairings and closes the files.
+        """
+
+        if self._duties.closed:
+            return
+        self.flush()
+        self._duties.close()
+        self._lengths.close()
+
+    def to_pool(self, table: LegTable, graph: DutyGraph) -> PairingPool:
+        """
+        Closes the sink and returns the written pairings as a PairingPool,
+        with the duty indices memory-mapped from the file.
+
+        Parameters
+        ----------
+        `table` : LegTable
+            The table holding the legs of the duties
+        `graph` : DutyGraph
+            The graph the duty indices refer to
+        """
+
+        self.close()
+        duty_arrays = graph.to_arrays(table)
+        lengths = np.fromfile(f"{self.path}.lengths", dtype=np.int32)
+        pairing_duties = (
+            np.memmap(f"{self.path}.duties", dtype=np.int32, mode="r")
+            if lengths.sum() > 0
+            else np.zeros(0, dtype=np.int32)
+        )
+        return PairingPool(
+            table,
+            duty_arrays["duty_offsets"],
+            duty_arrays["duty_legs"],
+            _offsets(lengths.tolist()),
+            pairing_duties,
+        )
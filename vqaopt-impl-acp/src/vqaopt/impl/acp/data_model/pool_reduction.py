@@ -0,0 +1,171 @@
+"""
+Reduction of a pairing pool to a fixed budget
+"""
+
+import heapq
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class PoolReductionReport:
+    """
+    Describes how a pool reduction changed the coverage of the legs.
+
+    Fields
+    ----------
+    `num_pairings` : int
+        The number of pairings before the reduction
+    `num_selected` : int
+        The number of pairings kept
+    `uncoverable_legs` : list[int]
+        The legs that were covered by some pairing but are not covered by
+        any kept pairing
+    `single_cover_legs` : list[int]
+        The legs that were covered by more than one pairing but are covered by
+        exactly one kept pairing
+    `costlier_legs` : list[int]
+        The legs whose cheapest covering pairing was not kept
+    """
+
+    num_pairings: int
+    num_selected: int
+    uncoverable_legs: list[int]
+    single_cover_legs: list[int]
+    costlier_legs: list[int]
+
+
+class PoolReducer:
+    """
+    Selects a limited number of pairings that keep the legs coverable.
+    """
+
+    @staticmethod
+    def select(
+        pairing_indices: np.ndarray,
+        leg_indices: np.ndarray,
+        num_legs: int,
+        costs: np.ndarray,
+        budget: int,
+        scores: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, PoolReductionReport]:
+        """
+        Selects at most `budget` pairings.
+
+        First a greedy weighted set cover picks pairings by cost per newly
+        covered leg until every coverable leg is covered, which keeps each leg
+        coverable if the budget allows it. The pairings are kept in a heap by
+        their ratio, which is only updated when a pairing comes up, so the
+        costs must not be negative. The remaining budget is filled in rounds:
+        every round adds the next best pairing of each leg by `scores`, legs
+        with the fewest selected pairings first. Legs and pairings are looked
+        up through the incidence sorted both ways.
+
+        Parameters
+        ----------
+        `pairing_indices` : np.ndarray
+            The pairing of each nonzero entry of the incidence, see
+            `ACPProblem.leg_incidence`
+        `leg_indices` : np.ndarray
+            The leg of each nonzero entry of the incidence
+        `num_legs` : int
+            The number of legs
+        `costs` : np.ndarray
+            The cost of each pairing
+        `budget` : int
+            The most pairings to select
+        `scores` : np.ndarray | None, defaults to None
+            The preference of each pairing for filling the budget, lower is
+            better, e.g. reduced costs. The costs if None.
+
+        Returns
+        ----------
+        tuple[np.ndarray, PoolReductionReport]
+            The indices of the selected pairings in ascending order, and how
+            the coverage of the legs changed.
+        """
+
+        costs = np.asarray(costs, dtype=np.float64)
+        scores = costs if scores is None else np.asarray(scores, dtype=np.float64)
+        num_pairings = len(costs)
+
+        by_pairing = np.argsort(pairing_indices, kind="stable")
+        legs_of = leg_indices[by_pairing]
+        pairing_starts = np.searchsorted(
+            pairing_indices[by_pairing], np.arange(num_pairings + 1)
+        ).tolist()
+
+        by_leg = np.lexsort((pairing_indices, scores[pairing_indices], leg_indices))
+        by_leg_pairings = pairing_indices[by_leg]
+        pairings_of = by_leg_pairings.tolist()
+        leg_starts = np.searchsorted(
+            leg_indices[by_leg], np.arange(num_legs + 1)
+        ).tolist()
+
+        selected = np.zeros(num_pairings, dtype=bool)
+        counts = np.zeros(num_legs, dtype=np.int64)
+        num_selected = 0
+
+        def select(pairing: int) -> None:
+            nonlocal num_selected
+            selected[pairing] = True
+            counts[legs_of[pairing_starts[pairing] : pairing_starts[pairing + 1]]] += 1
+            num_selected += 1
+
+        # Number of legs of each pairing not covered yet, updated through the
+        # pairings of each newly covered leg. Ratios only grow as legs get
+        # covered, so heap entries are re-scored lazily when they come up.
+        uncovered = np.diff(pairing_starts)
+        cost_list = costs.tolist()
+        covering = np.flatnonzero(uncovered > 0)
+        ratios = costs[covering] / uncovered[covering]
+        order = np.argsort(ratios, kind="stable")
+        # Sorted by ratio and pairing, which is already a heap.
+        heap = list(zip(ratios[order].tolist(), covering[order].tolist()))
+        remaining = int(np.count_nonzero(np.bincount(leg_indices, minlength=num_legs)))
+        while remaining and num_selected < budget:
+            ratio, pairing = heapq.heappop(heap)
+            count = int(uncovered[pairing])
+            if count == 0:
+                continue
+            if cost_list[pairing] / count != ratio:
+                heapq.heappush(heap, (cost_list[pairing] / count, pairing))
+                continue
+            legs = legs_of[pairing_starts[pairing] : pairing_starts[pairing + 1]]
+            for leg in legs[counts[legs] == 0].tolist():
+                uncovered[by_leg_pairings[leg_starts[leg] : leg_starts[leg + 1]]] -= 1
+                remaining -= 1
+            select(pairing)
+
+        rank = 0
+        while num_selected < budget:
+            candidates = False
+            for leg in np.argsort(counts, kind="stable").tolist():
+                position = leg_starts[leg] + rank
+                if position >= leg_starts[leg + 1]:
+                    continue
+                candidates = True
+                pairing = pairings_of[position]
+                if not selected[pairing]:
+                    select(pairing)
+                    if num_selected == budget:
+                        break
+            if not candidates:
+                break
+            rank += 1
+
+        before = np.bincount(leg_indices, minlength=num_legs)
+        cheapest_before = np.full(num_legs, np.inf)
+        np.minimum.at(cheapest_before, leg_indices, costs[pairing_indices])
+        cheapest_after = np.full(num_legs, np.inf)
+        kept = selected[pairing_indices]
+        np.minimum.at(cheapest_after, leg_indices[kept], costs[pairing_indices[kept]])
+
+        return np.flatnonzero(selected), PoolReductionReport(
+            num_pairings,
+            num_selected,
+            np.flatnonzero((before > 0) & (counts == 0)).tolist(),
+            np.flatnonzero((before > 1) & (counts == 1)).tolist(),
+            np.flatnonzero((counts > 0) & (cheapest_after > cheapest_before)).tolist(),
+        )
@@ -0,0 +1,264 @@
+"""
+Reachability of the home bases in the duty connection graph
+"""
+
+import typing
+from dataclasses import dataclass
+
+import numpy as np
+
+from .duty_graph import DutyGraph
+from .leg_table import LegTable
+
+# Sentinel day ordinals of duties that can not reach or be reached from a base,
+# far enough from any date that differences do not overflow.
+NEVER = 1 << 40
+
+
+@dataclass
+class ReachabilityReport:
+    """
+    Describes the duties and legs that no pairing can contain.
+
+    Fields
+    ----------
+    `num_duties` : int
+        The number of duties of the graph
+    `num_usable` : int
+        The number of duties that can be part of a pairing
+    `uncoverable_legs` : list[int]
+        The table rows of the legs in no usable duty, which no pairing covers
+    """
+
+    num_duties: int
+    num_usable: int
+    uncoverable_legs: list[int]
+
+
+class Reachability:
+    """
+    Which home bases the duties of a DutyGraph can return to, and how soon.
+
+    A pairing starts with a root duty departing from a home base and ends with
+    a duty arriving there, within the maximum number of days of the pairing.
+    Two passes over the days of the graph bound which duties can be part of
+    one: backwards, the earliest day each duty can reach each home base by a
+    path of connections, and forwards, the latest day of a root at each home
+    base the duty can be reached from. Only the connections of the graph and
+    the minimum gap between duties are followed, the other rules are not
+    checked, so the bounds never exclude a valid pairing.
+
+    Days are ordinals of their dates, see `date.toordinal`.
+
+    Fields
+    ----------
+    `home_bases` : list[str]
+        The departure airports of the roots
+    `close_days` : np.ndarray
+        The earliest day a path starting with each duty can arrive at each
+        home base, NEVER if none, indexed by duty and home base
+    `start_days` : np.ndarray
+        The latest day of a root at each home base a path can reach each duty
+        from, -NEVER if none, indexed by duty and home base
+    `max_days` : int | None
+        The maximum number of days of a pairing, unbounded if None
+    """
+
+    home_bases: list[str]
+    close_days: np.ndarray
+    start_days: np.ndarray
+    max_days: int | None
+
+    def __init__(
+        self,
+        graph: DutyGraph,
+        roots: typing.Sequence[int],
+        min_gap: int | None = None,
+        max_days: int | None = None,
+    ) -> None:
+        """
+        Computes the reachability of the home bases of `roots`.
+
+        Parameters
+        ----------
+        `graph` : DutyGraph
+            The connection graph of the duties
+        `roots` : Sequence[int]
+            The indices of the duties pairings can start with
+        `min_gap` : int | None, defaults to None
+            The least time in minutes between consecutive duties of a pairing
+        `max_days` : int | None, defaults to None
+            The maximum number of days from the first to the last duty of a
+            pairing, unbounded if None
+        """
+
+        self.home_bases = sorted(
+            {graph.duties[root].departure_airport for root in roots}
+        )
+        self.max_days = max_days
+        self._graph = graph
+        self._columns: dict[int, list[int]] = {}
+
+        bases = {airport: base for base, airport in enumerate(self.home_bases)}
+        num_duties = len(graph.duties)
+        ordinals = np.array([day.toordinal() for day in graph.days], dtype=np.int64)
+        duty_ordinals = ordinals[np.asarray(graph.duty_days, dtype=np.int64)]
+        starts, ends = graph.minutes()
+
+        self.close_days = np.full((num_duties, len(bases)), NEVER, dtype=np.int64)
+        self.start_days = np.full((num_duties, len(bases)), -NEVER, dtype=np.int64)
+        for index, duty in enumerate(graph.duties):
+            base = bases.get(duty.arrival_airport)
+            if base is not None:
+                self.close_days[index, base] = duty_ordinals[index]
+        for root in roots:
+            base = bases[graph.duties[root].departure_airport]
+            self.start_days[root, base] = duty_ordinals[root]
+
+        departing = [
+            _group(graph, day, "departure_airport", starts)
+            for day in range(graph.num_days)
+        ]
+        arriving = [
+            _group(graph, day, "arrival_airport", ends) for day in range(graph.num_days)
+        ]
+
+        # Backwards, the closing days of later days are final when a day is
+        # processed. Closing beyond the maximum duration of a pairing starting
+        # on the day of the duty does not matter.
+        suffix_min: list[dict[str, tuple[np.ndarray, np.ndarray]]] = [
+            {} for _ in graph.days
+        ]
+        for day in reversed(range(graph.num_days)):
+            for next_day in range(day + 1, graph.num_days):
+                if (
+                    max_days is not None
+                    and ordinals[next_day] - ordinals[day] > max_days
+                ):
+                    break
+                for airport, (_, rows) in arriving[day].items():
+                    group = suffix_min[next_day].get(airport)
+                    if group is None:
+                        continue
+                    times, minima = group
+                    positions = (
+                        np.zeros(len(rows), dtype=np.int64)
+                        if min_gap is None
+                        else np.searchsorted(times, ends[rows] + min_gap)
+                    )
+                    self.close_days[rows] = np.minimum(
+                        self.close_days[rows], minima[positions]
+                    )
+            for airport, (times, rows) in departing[day].items():
+                minima = np.minimum.accumulate(self.close_days[rows][::-1])[::-1]
+                suffix_min[day][airport] = (
+                    times,
+                    np.vstack([minima, np.full(len(bases), NEVER)]),
+                )
+
+        # Forwards, the same for the start days of earlier days.
+        prefix_max: list[dict[str, tuple[np.ndarray, np.ndarray]]] = [
+            {} for _ in graph.days
+        ]
+        for day in range(graph.num_days):
+            for previous_day in reversed(range(day)):
+                if (
+                    max_days is not None
+                    and ordinals[day] - ordinals[previous_day] > max_days
+                ):
+                    break
+                for airport, (_, rows) in departing[day].items():
+                    group = prefix_max[previous_day].get(airport)
+                    if group is None:
+                        continue
+                    times, maxima = group
+                    positions = (
+                        np.full(len(rows), len(times), dtype=np.int64)
+                        if min_gap is None
+                        else np.searchsorted(times, starts[rows] - min_gap, "right")
+                    )
+                    self.start_days[rows] = np.maximum(
+                        self.start_days[rows], maxima[positions]
+                    )
+            for airport, (times, rows) in arriving[day].items():
+                maxima = np.maximum.accumulate(self.start_days[rows])
+                prefix_max[day][airport] = (
+                    times,
+                    np.vstack([np.full(len(bases), -NEVER), maxima]),
+                )
+
+    def base_of(self, root: int) -> int:
+        """
+        Returns the index in `home_bases` of the departure airport of a root.
+        """
+
+        return self.home_bases.index(self._graph.duties[root].departure_airport)
+
+    def deadline(self, root: int) -> int:
+        """
+        Returns the last day a pairing starting with `root` can end on.
+        """
+
+        if self.max_days is None:
+            return NEVER - 1
+        return self._graph.days[self._graph.duty_days[root]].toordinal() + (
+            self.max_days
+        )
+
+    def close_column(self, base: int) -> list[int]:
+        """
+        Returns the closing days of the duties at a home base as a list, for
+        lookups one duty at a time.
+        """
+
+        if base not in self._columns:
+            self._columns[base] = self.close_days[:, base].tolist()
+        return self._columns[base]
+
+    def usable(self) -> np.ndarray:
+        """
+        Returns a boolean mask of the duties that can be part of a pairing:
+        reachable from a root at a home base and able to return there within
+        the maximum number of days.
+        """
+
+        reachable = (self.start_days > -NEVER) & (self.close_days < NEVER)
+        if self.max_days is not None:
+            reachable &= self.close_days - self.start_days <= self.max_days
+        return reachable.any(axis=1)
+
+    def report(self, table: LegTable) -> ReachabilityReport:
+        """
+        Returns the number of usable duties and the legs of `table` they do
+        not cover.
+        """
+
+        usable = self.usable()
+        legs = {
+            leg
+            for index in np.flatnonzero(usable).tolist()
+            for leg in self._graph.duties[index].legs
+        }
+        covered = np.zeros(len(table), dtype=np.bool_)
+        covered[table.rows(list(legs))] = True
+        return ReachabilityReport(
+            num_duties=len(usable),
+            num_usable=int(np.count_nonzero(usable)),
+            uncoverable_legs=np.flatnonzero(~covered).tolist(),
+        )
+
+
+def _group(
+    graph: DutyGraph, day: int, airport: str, minutes: np.ndarray
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    # The duties of a day by departure or arrival airport, as their times and
+    # indices sorted by time.
+    rows: dict[str, list[int]] = {}
+    for index in graph.day_range(day):
+        rows.setdefault(getattr(graph.duties[index], airport), []).append(index)
+    groups = {}
+    for name, indices in rows.items():
+        order = np.argsort(minutes[indices], kind="stable")
+        sorted_indices = np.asarray(indices, dtype=np.int64)[order]
+        groups[name] = (minutes[sorted_indices], sorted_indices)
+    return groups
@@ -2,24 +2,134 @@
 Load the ACP problem from a CSV file.
 """
 
+import functools
+import inspect
+import json
+import shutil
+import tempfile
 import typing
+from dataclasses import asdict
 from datetime import datetime
+from pathlib import Path
 
-from vqaopt.core.plugin import Field, ProblemLoader
+import numpy as np
+
+from vqaopt.core.plugin import Field, Plugin, ProblemLoader
 
 from ..acp_problem import ACPProblem
 from ..cost_model import ACPCostModel
-from ..data_model import Leg, LegContainer, Pairing
+from ..data_model import (
+    DutyGraph,
+    Leg,
+    LegContainer,
+    LegTable,
+    PairingPool,
+    PairingSink,
+    PoolReducer,
+)
+from ..data_model.column_generation import ColumnGenerator
 from ..data_model.duty_generation import DutyGenerator
+from ..data_model.pairing_bidirectional import BidirectionalGenerator
 from ..data_model.pairing_generation import PairingGenerator
+from ..data_model.pairing_join import JoinGenerator
+from ..data_model.pairing_labeling import PairingLabeler
 from ..rule import ACPDutyRule, ACPPairingRule
-from ..utils import load_legs_from_file
+from ..utils import (
+    ArrayCache,
+    digest,
+    file_digest,
+    instrumentation,
+    load_leg_table,
+    read_legs_from_file,
+)
+
+CACHE_VERSION = 2
+
+T = typing.TypeVar("T")
+
+
+def _cached(
+    cache: ArrayCache | None,
+    key: str | None,
+    build: typing.Callable[[], T],
+    to_arrays: typing.Callable[[T], typing.Mapping[str, np.ndarray]],
+    from_arrays: typing.Callable[[dict[str, np.ndarray]], T],
+) -> T:
+    # Restores a stage from the cache, or builds and stores it.
+    if cache is None or key is None:
+        return build()
+
+    arrays = cache.load(key)
+    if arrays is not None:
+        return from_arrays(arrays)
+
+    value = build()
+    cache.store(key, to_arrays(value))
+    return value
+
+
+def _qualified_name(obj: object) -> str:
+    return f"{type(obj).__module__}.{type(obj).__qualname__}"
+
+
+_LIBRARY_MODULES = ("builtins", "abc", "typing", "pydantic")
+
+
+@functools.cache
+def _class_source(cls: type) -> str:
+    # The digest of the source of a class and its bases outside the libraries,
+    # so that a plugin edited in place gets new cache keys. Functions the class
+    # only calls are not covered, changes to those need a new CACHE_VERSION.
+    sources = []
+    for base in cls.__mro__:
+        if base.__module__.partition(".")[0] in _LIBRARY_MODULES:
+            continue
+        try:
+            sources.append(inspect.getsource(base))
+        except (OSError, TypeError):
+            sources.append(f"{base.__module__}.{base.__qualname__}")
+    return digest(sources)
+
+
+def _serialize(plugin: Plugin) -> str:
+    return (
+        f"{_qualified_name(plugin)}:{_class_source(type(plugin))}:"
+        f"{plugin.model_dump_json()}"
+    )
+
+
+def _has_custom_rows(loader: "LoadACP_CSV") -> bool:
+    return type(loader).process_row is not LoadACP_CSV.process_row
 
 
 class LoadACP_CSV(ProblemLoader[ACPProblem]):
     """
     Load flight legs from a CSV file and generate pairings for the ACP problem
     based on `cost_model`, `duty_rules` and `pairing_rules`.
+
+    Pairings are enumerated exhaustively by default. `pairing_engine` selects
+    building all pairings of the same number of duties at once instead
+    (`join`, the same pairings ordered by number of duties), joining them with
+    halves searched back from the home bases (`bidirectional`, the same
+    pairings, worth it when `MaxDuties` binds before the other rules), resource-
+    constrained labeling, or column generation, which only keeps the pairings
+    priced in by the LP relaxation and reports the LP bound in
+    `ACPProblem.metadata` (requires SciPy). Column generation adds at most
+    `column_generation_columns` pairings per iteration and stops after
+    `column_generation_iterations` master problems.
+
+    Duties that can not be part of any pairing are dropped before pairings are
+    generated, see `Reachability`. The legs no pairing can cover are reported
+    as `reachability` in `ACPProblem.metadata`.
+
+    `max_pairings` limits the pool to the number of qubits available, see
+    `reduce_pool`.
+
+    With `instrument` the time of each stage, the expansions and candidates of
+    the generators and the checks, rejections and time of each rule are
+    recorded as `instrumentation` in `ACPProblem.metadata`, see
+    `Instrumentation`. Stages restored from the cache are not generated and
+    have no counters.
     """
 
     cost_model: ACPCostModel = Field(
@@ -35,6 +145,59 @@ class LoadACP_CSV(ProblemLoader[ACPProblem]):
         default="",
         title="Set data source",
     )
+    pairing_engine: typing.Literal[
+        "enumeration", "bidirectional", "join", "labeling", "column_generation"
+    ] = Field(
+        default="enumeration",
+        title="Select pairing generation engine",
+    )
+    labeling_k: int = Field(
+        default=0,
+        title="Keep the K cheapest pairings per leg when labeling, 0 for all "
+        "non-dominated pairings",
+        ge=0,
+    )
+    column_generation_columns: int = Field(
+        default=50,
+        title="Add at most N pairings per column generation iteration",
+        ge=1,
+    )
+    column_generation_iterations: int = Field(
+        default=200,
+        title="Solve the column generation master problem at most N times",
+        ge=1,
+    )
+    spill_dir: str = Field(
+        default="",
+        title="Spill generated pairings to a directory",
+    )
+    max_pairings: int = Field(
+        default=0,
+        title="Limit the number of pairings, 0 for no limit",
+        ge=0,
+    )
+    workers: int = Field(
+        default=1,
+        title="Set number of worker processes",
+        ge=1,
+    )
+    instrument: bool = Field(
+        default=False,
+        title="Record generation counters and timers",
+    )
+    cache: bool = Field(
+        default=True,
+        title="Cache generated legs, duties and pairings",
+    )
+    cache_dir: str = Field(
+        default=".acp_cache",
+        title="Set cache directory",
+    )
+    cache_size: int = Field(
+        default=1 << 30,
+        title="Set cache size limit in bytes",
+        ge=0,
+    )
 
     @classmethod
     def get_name(cls) -> str:
@@ -45,48 +208,254 @@ class LoadACP_CSV(ProblemLoader[ACPProblem]):
         return ACPProblem
 
     def load_problem(self) -> ACPProblem:
+        if not self.instrument:
+            return self._load_problem()
+
+        with instrumentation.record() as recorder:
+            with recorder.stage("load"):
+                problem = self._load_problem()
+        problem.metadata["instrumentation"] = recorder.to_dict()
+        return problem
+
+    def _load_problem(self) -> ACPProblem:
+        cache = ArrayCache(self.cache_dir, self.cache_size) if self.cache else None
+        keys = self.cache_keys() if cache is not None else {}
+
+        with instrumentation.stage("legs"):
+            legs = _cached(
+                cache,
+                keys.get("legs"),
+                self.load_raw_data,
+                lambda legs: legs.table.to_arrays(),
+                lambda arrays: LegTable.from_arrays(arrays).to_container(),
+            )
+
+        def generate_pairings() -> tuple[PairingPool, dict[str, typing.Any]]:
+            with instrumentation.stage("duties"):
+                graph = _cached(
+                    cache,
+                    keys.get("duties"),
+                    lambda: DutyGraph(
+                        DutyGenerator.generate_full_period(
+                            legs, self.duty_rules, self.workers
+                        )
+                    ),
+                    lambda graph: graph.to_arrays(legs.table),
+                    lambda arrays: DutyGraph.from_arrays(legs.table, arrays),
+                )
+            with instrumentation.stage("reachability"):
+                reachability = PairingGenerator.reachability(graph, self.pairing_rules)
+                report = reachability.report(legs.table)
+                graph = graph.subgraph(np.flatnonzero(reachability.usable()).tolist())
+            with instrumentation.stage("pairings"):
+                pairings, metadata = build_pool(graph)
+            return pairings, {**metadata, "reachability": asdict(report)}
 
-        legs = self.load_raw_data()
+        def build_pool(
+            graph: DutyGraph,
+        ) -> tuple[PairingPool, dict[str, typing.Any]]:
+            paths: typing.Iterable[list[int]]
+            metadata: dict[str, typing.Any] = {}
+            if self.pairing_engine == "column_generation":
+                paths, metadata = ColumnGenerator.generate_paths(
+                    legs.table,
+                    graph,
+                    self.pairing_rules,
+                    self.cost_model,
+                    self.column_generation_columns,
+                    self.column_generation_iterations,
+                )
+            elif self.pairing_engine == "labeling":
+                paths = PairingLabeler.generate_paths(
+                    graph, self.pairing_rules, self.cost_model, self.labeling_k
+                )
+            elif self.pairing_engine == "join":
+                paths = JoinGenerator.iter_paths(graph, self.pairing_rules)
+            elif self.pairing_engine == "bidirectional":
+                paths = BidirectionalGenerator.iter_paths(graph, self.pairing_rules)
+            else:
+                paths = PairingGenerator.iter_paths(
+                    graph, self.pairing_rules, self.workers
+                )
 
-        daily_duties = DutyGenerator.generate_full_period(legs, self.duty_rules)
-        pairings: list[Pairing] = PairingGenerator.generate_full_period(
-            daily_duties, self.pairing_rules
+            if not self.spill_dir:
+                return PairingPool.from_graph(legs.table, graph, paths), metadata
+
+            Path(self.spill_dir).mkdir(parents=True, exist_ok=True)
+            spill = tempfile.mkdtemp(prefix="pairings-", dir=self.spill_dir)
+            try:
+                with PairingSink(str(Path(spill) / "pairings")) as sink:
+                    sink.extend(paths)
+                return sink.to_pool(legs.table, graph), metadata
+            finally:
+                # The mapped file stays readable after it is unlinked.
+                shutil.rmtree(spill, ignore_errors=True)
+
+        pairings, metadata = _cached(
+            cache,
+            keys.get("pairings"),
+            generate_pairings,
+            lambda result: {
+                **result[0].to_arrays(),
+                "metadata": np.array(json.dumps(result[1])),
+            },
+            lambda arrays: (
+                PairingPool.from_arrays(legs.table, arrays),
+                json.loads(arrays["metadata"].item()),
+            ),
+        )
+        problem = ACPProblem(
+            legs=legs,
+            pairings=pairings,
+            cost_model=self.cost_model,
+            metadata=metadata,
+        )
+
+        if cache is not None:
+            with instrumentation.stage("costs"):
+                cost_vector = _cached(
+                    cache,
+                    keys["costs"],
+                    lambda: problem.cost_vector,
+                    lambda costs: {"cost_vector": costs},
+                    lambda arrays: arrays["cost_vector"],
+                )
+            problem._cache["cost_vector"] = cost_vector
+
+        if self.max_pairings and len(problem.pairings) > self.max_pairings:
+            with instrumentation.stage("pool_reduction"):
+                problem = self.reduce_pool(problem)
+        return problem
+
+    def reduce_pool(self, problem: ACPProblem) -> ACPProblem:
+        """
+        Returns the problem with at most `max_pairings` of its pairings, in
+        their original order, see `PoolReducer.select`.
+
+        The budget is filled by reduced cost if column generation reported the
+        LP duals of the legs, by cost otherwise. How the coverage of the legs
+        changed is reported as `pool_reduction` in `ACPProblem.metadata`.
+        """
+
+        assert isinstance(problem.pairings, PairingPool)
+        pairing_indices, leg_indices = problem.leg_incidence()
+        costs = problem.cost_vector
+
+        scores = None
+        if "lp_duals" in problem.metadata:
+            duals = np.asarray(problem.metadata["lp_duals"], dtype=np.float64)
+            scores = costs - np.bincount(
+                pairing_indices, weights=duals[leg_indices], minlength=len(costs)
+            )
+
+        selected, report = PoolReducer.select(
+            pairing_indices,
+            leg_indices,
+            len(problem.legs),
+            costs,
+            self.max_pairings,
+            scores,
+        )
+        reduced = ACPProblem(
+            legs=problem.legs,
+            pairings=problem.pairings.subset(selected),
+            cost_model=problem.cost_model,
+            metadata={**problem.metadata, "pool_reduction": asdict(report)},
+        )
+        reduced._cache["cost_vector"] = costs[selected]
+        return reduced
+
+    def cache_keys(self) -> dict[str, str]:
+        """
+        Returns the cache keys of the stages of `load_problem`.
+
+        Each key covers everything its stage depends on: the contents of the
+        input files and the row processing for the legs, then in turn the duty
+        rules, the pairing rules (with the engine settings and the cost model
+        unless enumerating) and the cost model. Plugins are keyed by their
+        settings and the source of their classes, a custom `process_row` by
+        the source of the loader class. Code the classes call, like the
+        generators, is covered by `CACHE_VERSION` only.
+        """
+
+        import_list = self.import_from
+        if isinstance(self.import_from, str):
+            import_list = [self.import_from]
+
+        legs = digest(
+            CACHE_VERSION,
+            (
+                f"{_qualified_name(self)}:{_class_source(type(self))}"
+                if _has_custom_rows(self)
+                else ""
+            ),
+            [file_digest(path) for path in import_list],
+        )
+        duties = digest(legs, sorted(_serialize(rule) for rule in self.duty_rules))
+        pairings = digest(
+            duties,
+            sorted(_serialize(rule) for rule in self.pairing_rules),
+            (
+                []
+                if self.pairing_engine == "enumeration"
+                else [
+                    self.pairing_engine,
+                    self.labeling_k,
+                    self.column_generation_columns,
+                    self.column_generation_iterations,
+                    _serialize(self.cost_model),
+                ]
+            ),
         )
-        return ACPProblem(legs=legs, pairings=pairings, cost_model=self.cost_model)
+        costs = digest(pairings, _serialize(self.cost_model))
+        return {"legs": legs, "duties": duties, "pairings": pairings, "costs": costs}
 
     def load_raw_data(self) -> LegContainer:
         """
-        Parse the CSV file and return a container with the flight legs.
+        Parse the CSV files and return a container with the flight legs.
+
+        The files are parsed in bulk unless a subclass overrides `process_row`,
+        in which case every row is passed to it.
         """
 
         import_list = self.import_from
         if isinstance(self.import_from, str):
             import_list = [self.import_from]
 
-        def process_row(row: typing.Sequence[str]) -> Leg:
-            departure_airport: str = row[1].strip()
-            departure_datetime: datetime = datetime.strptime(
-                row[2].strip() + row[3].strip(), "%Y-%m-%d%H:%M"
-            )
-            arrival_airport: str = row[4].strip()
-            arrival_datetime: datetime = datetime.strptime(
-                row[5].strip() + row[6].strip(), "%Y-%m-%d%H:%M"
-            )
-            flight_designator: str = row[0].strip()
-            is_dep_home_base = departure_airport.lower().startswith("base")
-            return Leg(
-                departure_airport,
-                departure_datetime,
-                arrival_airport,
-                arrival_datetime,
-                flight_designator,
-                is_dep_home_base,
-            )
+        if not _has_custom_rows(self):
+            return load_leg_table(import_list).to_container()
 
         return LegContainer(
             leg
             for path in import_list
-            for leg in load_legs_from_file(process_row, path)
+            for leg in read_legs_from_file(self.process_row, path)
+        )
+
+    def process_row(self, row: typing.Sequence[str]) -> Leg:
+        """
+        Turn a single row of a CSV file into a Leg.
+
+        Override to load files in a custom format, see `load_legs_from_file`
+        for the default columns.
+        """
+
+        departure_airport: str = row[1].strip()
+        departure_datetime: datetime = datetime.strptime(
+            row[2].strip() + row[3].strip(), "%Y-%m-%d%H:%M"
+        )
+        arrival_airport: str = row[4].strip()
+        arrival_datetime: datetime = datetime.strptime(
+            row[5].strip() + row[6].strip(), "%Y-%m-%d%H:%M"
+        )
+        flight_designator: str = row[0].strip()
+        is_dep_home_base = departure_airport.lower().startswith("base")
+        return Leg(
+            departure_airport,
+            departure_datetime,
+            arrival_airport,
+            arrival_datetime,
+            flight_designator,
+            is_dep_home_base,
         )
 
     def problem_count(self) -> int | None:
@@ -1,3 +1,4 @@
+from .presolve import ACPPostsolve, ACPPresolve
 from .red_acp import ACP2MCEC
 
-__all__ = ["ACP2MCEC"]
+__all__ = ["ACP2MCEC", "ACPPostsolve", "ACPPresolve"]
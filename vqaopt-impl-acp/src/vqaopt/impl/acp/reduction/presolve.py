@@ -0,0 +1,240 @@
+"""
+Presolve the exact cover of the ACP before it is handed to a solver.
+"""
+
+import typing
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from ..acp_problem import ACPProblem
+from ..data_model import LegContainer, Pairing, PairingPool
+
+
+def _gather(starts: np.ndarray, values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    # Concatenates the CSR rows `rows` of `values`.
+    lengths = starts[rows + 1] - starts[rows]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return values[
+        np.repeat(starts[rows] - offsets[:-1], lengths) + np.arange(offsets[-1])
+    ]
+
+
+@dataclass
+class ACPPostsolve:
+    """
+    Maps the solutions of a presolved problem back to the original problem.
+
+    Fields
+    ----------
+    `original` : ACPProblem
+        The problem before the presolve
+    `presolved` : ACPProblem
+        The problem after the presolve
+    `fixed` : np.ndarray
+        The indices of the pairings in every exact cover, in the original
+        problem
+    `kept` : np.ndarray
+        The index in the original problem of each pairing of the presolved one
+    `kept_legs` : np.ndarray
+        The index in the original problem of each leg of the presolved one
+    `stats` : dict[str, Any]
+        The number of pairings and legs removed by each reduction, see
+        `ACPPresolve.presolve`
+    """
+
+    original: ACPProblem
+    presolved: ACPProblem = field(repr=False)
+    fixed: np.ndarray
+    kept: np.ndarray
+    kept_legs: np.ndarray
+    stats: dict[str, typing.Any] = field(default_factory=dict)
+
+    @property
+    def fixed_cost(self) -> float:
+        """
+        The cost of the fixed pairings, the difference between the cost of a
+        solution of the presolved problem and its original cost.
+        """
+
+        return float(self.original.cost_vector[self.fixed].sum())
+
+    def bitstring_matrix(
+        self, bitstrings: typing.Iterable[typing.Iterable | int]
+    ) -> np.ndarray:
+        """
+        Unpacks bitstrings of the presolved problem into a boolean
+        (bitstrings x pairings) matrix of the original problem, with the fixed
+        pairings selected.
+
+        Parameters
+        ----------
+        `bitstrings` : Iterable[Iterable | int]
+            The bitstrings of the presolved problem, see
+            `ACPProblem.bitstring_matrix`.
+        """
+
+        bitstrings = list(bitstrings)
+        matrix = np.zeros((len(bitstrings), len(self.original.pairings)), dtype=bool)
+        matrix[:, self.kept] = self.presolved.bitstring_matrix(bitstrings)
+        matrix[:, self.fixed] = True
+        return matrix
+
+    def bitstrings(
+        self, bitstrings: typing.Iterable[typing.Iterable | int]
+    ) -> list[str]:
+        """
+        Returns the bitstrings of the original problem for bitstrings of the
+        presolved problem, in the format of `ACPProblem.pairings_from_bitstring`.
+        """
+
+        return [
+            "".join("1" if bit else "0" for bit in row[::-1].tolist())
+            for row in self.bitstring_matrix(bitstrings)
+        ]
+
+    def pairings_from_bitstring(
+        self, bitstring: typing.Iterable | int
+    ) -> list[Pairing]:
+        """
+        Returns the pairings of the original problem selected by a bitstring of
+        the presolved problem, the fixed pairings included.
+        """
+
+        (row,) = self.bitstring_matrix([bitstring])
+        return [self.original.pairings[i] for i in np.flatnonzero(row).tolist()]
+
+    def costs_of_bitstrings(
+        self, bitstrings: typing.Iterable[typing.Iterable | int]
+    ) -> np.ndarray:
+        """
+        Returns the original costs of bitstrings of the presolved problem.
+        """
+
+        return self.bitstring_matrix(bitstrings) @ self.original.cost_vector
+
+
+class ACPPresolve:
+    """
+    Shrinks the exact cover of an ACP without changing its optimal solutions.
+    """
+
+    @staticmethod
+    def presolve(problem: ACPProblem) -> ACPProblem:
+        """
+        Returns the presolved problem, with the mapping back to `problem` as
+        its `postsolve`.
+
+        The reductions are:
+
+        - duplicate pairings: of the pairings covering the same legs only the
+          cheapest one is kept, the first one on ties
+        - single covers: a leg covered by a single pairing forces it into the
+          solution. Its legs are removed, and so are the other pairings
+          covering any of them, which may leave more legs with a single cover.
+
+        The single covers are applied in rounds until none is left. A round
+        that would force overlapping pairings proves that there is no exact
+        cover, the presolve then stops before it.
+
+        The presolved problem keeps the remaining legs and pairings in their
+        original order. Its costs and incidence are carried over, and its
+        `metadata` holds the counts of the reductions as `presolve`.
+        """
+
+        pairing_indices, leg_indices = problem.leg_incidence()
+        costs = problem.cost_vector
+        num_pairings, num_legs = len(problem.pairings), len(problem.legs)
+
+        by_pairing = np.argsort(pairing_indices, kind="stable")
+        legs_of = leg_indices[by_pairing]
+        pairing_starts = np.searchsorted(
+            pairing_indices[by_pairing], np.arange(num_pairings + 1)
+        )
+        by_leg = np.argsort(leg_indices, kind="stable")
+        pairings_of = pairing_indices[by_leg]
+        leg_starts = np.searchsorted(leg_indices[by_leg], np.arange(num_legs + 1))
+
+        active = np.ones(num_pairings, dtype=bool)
+        open_legs = np.ones(num_legs, dtype=bool)
+
+        cheapest: dict[bytes, int] = {}
+        for index in np.lexsort((np.arange(num_pairings), costs)).tolist():
+            legs = np.sort(legs_of[pairing_starts[index] : pairing_starts[index + 1]])
+            if cheapest.setdefault(legs.tobytes(), index) != index:
+                active[index] = False
+        num_duplicates = num_pairings - int(np.count_nonzero(active))
+
+        counts = np.bincount(
+            leg_indices[active[pairing_indices]], minlength=num_legs
+        ).astype(np.int64)
+        uncoverable = np.flatnonzero(counts == 0)
+
+        fixed: list[np.ndarray] = []
+        infeasible = False
+        rounds = 0
+        while True:
+            singles = np.flatnonzero(open_legs & (counts == 1))
+            if len(singles) == 0:
+                break
+            candidates = _gather(leg_starts, pairings_of, singles)
+            forced = np.unique(candidates[active[candidates]])
+            covered = _gather(pairing_starts, legs_of, forced)
+            if len(np.unique(covered)) < len(covered):
+                infeasible = True
+                break
+
+            rounds += 1
+            fixed.append(forced)
+            open_legs[covered] = False
+            conflicts = np.unique(_gather(leg_starts, pairings_of, covered))
+            removed = conflicts[active[conflicts]]
+            active[removed] = False
+            np.subtract.at(counts, _gather(pairing_starts, legs_of, removed), 1)
+
+        fixed_pairings = np.sort(np.concatenate(fixed or [np.zeros(0, np.intp)]))
+        kept = np.flatnonzero(active)
+        kept_legs = np.flatnonzero(open_legs)
+        stats = {
+            "duplicate_pairings": num_duplicates,
+            "fixed_pairings": len(fixed_pairings),
+            "conflicting_pairings": num_pairings
+            - num_duplicates
+            - len(fixed_pairings)
+            - len(kept),
+            "covered_legs": num_legs - len(kept_legs),
+            "rounds": rounds,
+            "infeasible": infeasible,
+            "uncoverable_legs": sorted(
+                set(uncoverable.tolist())
+                | set(np.flatnonzero(open_legs & (counts == 0)).tolist())
+            ),
+        }
+
+        pairings: typing.Sequence[Pairing]
+        if isinstance(problem.pairings, PairingPool):
+            pairings = problem.pairings.subset(kept)
+        else:
+            pairings = [problem.pairings[i] for i in kept.tolist()]
+
+        reduced = ACPProblem(
+            legs=LegContainer(problem.legs[i] for i in kept_legs.tolist()),
+            pairings=pairings,
+            cost_model=problem.cost_model,
+            metadata={**problem.metadata, "presolve": stats},
+        )
+        reduced.postsolve = ACPPostsolve(
+            problem, reduced, fixed_pairings, kept, kept_legs, stats
+        )
+
+        new_pairing = np.full(num_pairings, -1, dtype=np.intp)
+        new_pairing[kept] = np.arange(len(kept))
+        new_leg = np.full(num_legs, -1, dtype=np.intp)
+        new_leg[kept_legs] = np.arange(len(kept_legs))
+        entries = active[pairing_indices] & open_legs[leg_indices]
+        reduced._cache["leg_incidence"] = (
+            new_pairing[pairing_indices[entries]],
+            new_leg[leg_indices[entries]],
+        )
+        reduced._cache["cost_vector"] = costs[kept]
+        return reduced
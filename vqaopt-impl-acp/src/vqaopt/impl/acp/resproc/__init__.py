@@ -1,3 +1,4 @@
+from .res_metadata import ResAcpMetadata
 from .res_pairings import ResAcpPairings
 
-__all__ = ["ResAcpPairings"]
+__all__ = ["ResAcpMetadata", "ResAcpPairings"]
@@ -0,0 +1,60 @@
+"""Write the metadata of the problem to the experiment folder."""
+
+import json
+import typing
+from pathlib import Path
+
+from vqaopt.core.plugin import Field, ResProc
+from vqaopt.core.problem import Problem
+from vqaopt.impl.utils.folder import get_folders
+
+from ..acp_problem import ACPProblem
+
+
+class ResAcpMetadata(ResProc):
+    """
+    Write the metadata of the problem to the experiment folder.
+
+    This includes the generation counters and timers of a loader with
+    `instrument` enabled, and the reports of the engines, pool reduction and
+    presolve.
+    """
+
+    file_name: str = Field(
+        default="acp_metadata",
+        title="File name",
+    )
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "ACP Metadata"
+
+    def after_problem(
+        self,
+        problem: Problem,
+        run_info: dict,
+        experiment_config,
+        result: dict,
+        experiment_folder: Path | None,
+    ) -> tuple[dict[str, typing.Any], dict[str, typing.Any]] | None:
+        if ACPProblem.get_name() not in problem.forms:
+            return None
+
+        problem = problem.forms[ACPProblem.get_name()]
+        run_indices: dict[str, typing.Any] = run_info.get("run_indices", {})
+        return run_indices, dict(problem.metadata)
+
+    def after_experiment(
+        self,
+        aggr: list[tuple[dict[str, typing.Any], dict[str, typing.Any]]],
+        experiment_folder: Path | None,
+    ) -> typing.Any:
+        for run_indices, metadata in aggr:
+            _, _, repetition_folder = get_folders(
+                experiment_folder or Path.cwd(),
+                **run_indices,
+            )
+            repetition_folder.mkdir(parents=True, exist_ok=True)
+            (repetition_folder / f"{self.file_name}.json").write_text(
+                json.dumps(metadata, indent=2, default=str), encoding="utf-8"
+            )
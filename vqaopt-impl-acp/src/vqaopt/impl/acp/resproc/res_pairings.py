@@ -67,15 +67,20 @@ class ResAcpPairings(ResProc):
         ising = problem.forms[IsingProblem.get_name()]
         run_indices: dict[str, typing.Any] = run_info.get("run_indices", {})
 
+        # A presolved problem maps its bitstrings back to the original pairings.
+        solution = problem.postsolve or problem
+        bitstrings = list(result["final_counts"])
+        costs = solution.costs_of_bitstrings(bitstrings)
+
         return run_indices, [
             {
                 "bitstring": k,
-                "count": v,
-                "cost": problem.cost_of_bitstring(k),
+                "count": result["final_counts"][k],
+                "cost": float(cost),
                 "ising_cost": ising.cost_of_bitstring(k),
-                "pairings": list(problem.pairings_from_bitstring(k)),
+                "pairings": list(solution.pairings_from_bitstring(k)),
             }
-            for k, v in result["final_counts"].items()
+            for k, cost in zip(bitstrings, costs)
         ]
 
     def _setup_figure(
@@ -292,7 +297,7 @@ class ResAcpPairings(ResProc):
 
                         fig.savefig(
                             repetition_folder
-                            / f"{self.file_name}_{i}_{int(result["bitstring"],2)}.{self.format}"
+                            / f"{self.file_name}_{i}_{int(result['bitstring'],2)}.{self.format}"
                         )
 
                         plt.close(fig)
@@ -1,9 +1,26 @@
-from .rule import ACPDutyRule, ACPPairingRule
-from .rule_checker import is_valid_duty, is_valid_pairing
+from .rule import ACPDutyRule, ACPPairingRule, ExtensionBatch, ExtensionBounds
+from .rule_checker import (
+    is_valid_duty,
+    is_valid_duty_extension,
+    is_valid_pairing,
+    is_valid_pairing_extension,
+    valid_duty_extensions,
+    valid_pairing_extensions,
+    valid_pairing_joins,
+)
+from .rule_order import AdaptiveRuleOrder
 
 __all__ = [
     "ACPDutyRule",
     "ACPPairingRule",
+    "AdaptiveRuleOrder",
+    "ExtensionBatch",
+    "ExtensionBounds",
     "is_valid_duty",
+    "is_valid_duty_extension",
     "is_valid_pairing",
+    "is_valid_pairing_extension",
+    "valid_duty_extensions",
+    "valid_pairing_extensions",
+    "valid_pairing_joins",
 ]
@@ -6,24 +6,218 @@ from __future__ import annotations
 
 import typing
 from abc import abstractmethod
+from dataclasses import dataclass
+
+import numpy as np
 
 from vqaopt.core.plugin import Plugin
 
 from ..data_model import Duty, Leg
 
 T = typing.TypeVar("T")
+E = typing.TypeVar("E")
+
+
+@dataclass(frozen=True)
+class ExtensionBatch:
+    """
+    Candidate items appended to the same valid prefix, as columns.
+
+    Times are whole minutes since `EPOCH` of `LegTable`, an item is a leg of a
+    duty or a duty of a pairing. When each candidate extends a prefix of its
+    own, see `ACPRule.is_valid_join_batch`, the prefix fields are arrays with
+    one value per candidate.
+
+    Fields
+    ----------
+    `prefix_length` : int | np.ndarray
+        The number of items in the prefix
+    `prefix_start` : int | np.ndarray
+        The first departure of the prefix
+    `prefix_end` : int | np.ndarray
+        The last arrival of the prefix
+    `departures` : np.ndarray
+        The first departure of each candidate
+    `arrivals` : np.ndarray
+        The last arrival of each candidate
+    """
+
+    prefix_length: int | np.ndarray
+    prefix_start: int | np.ndarray
+    prefix_end: int | np.ndarray
+    departures: np.ndarray
+    arrivals: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.departures)
+
+
+@dataclass(frozen=True)
+class ExtensionBounds:
+    """
+    Limits of a rule that generators can search within, see
+    `ACPRule.extension_bounds`.
+
+    Every limit is anti-monotone: once a sequence exceeds it, so does every
+    extension of the sequence, so the generators skip the candidates outside
+    the limits and do not extend a sequence that reached its maximum count.
+    None means unbounded. Times are whole minutes.
 
+    Fields
+    ----------
+    `max_count` : int | None
+        The maximum number of items of a sequence
+    `max_elapsed` : int | None
+        The maximum time from the first departure to the last arrival
+    `max_days` : int | None
+        The maximum number of days from the day of the first item to the day
+        of the last item
+    `min_gap` : int | None
+        The minimum time from the arrival of an item to the departure of the
+        next one
+    """
 
-class ACPRule(Plugin, typing.Generic[T]):
+    max_count: int | None = None
+    max_elapsed: int | None = None
+    max_days: int | None = None
+    min_gap: int | None = None
+
+    @classmethod
+    def of(cls, rules: typing.Iterable[ACPRule]) -> ExtensionBounds:
+        """
+        Returns the tightest limits of all `rules`.
+        """
+
+        bounds = cls()
+        for rule in rules:
+            bounds = bounds.intersect(rule.extension_bounds())
+        return bounds
+
+    def intersect(self, other: ExtensionBounds) -> ExtensionBounds:
+        """
+        Returns the limits of both `self` and `other`.
+        """
+
+        return ExtensionBounds(
+            _tightest(min, self.max_count, other.max_count),
+            _tightest(min, self.max_elapsed, other.max_elapsed),
+            _tightest(min, self.max_days, other.max_days),
+            _tightest(max, self.min_gap, other.min_gap),
+        )
+
+
+def _tightest(
+    pick: typing.Callable[[int, int], int], first: int | None, second: int | None
+) -> int | None:
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return pick(first, second)
+
+
+class ACPRule(Plugin, typing.Generic[T, E]):
 
     @abstractmethod
     def is_valid(self, to_validate: T) -> bool:
         pass
 
+    def is_valid_extension(self, prefix: T, item: E) -> bool:
+        """
+        Validates `[*prefix, item]`, given that the non-empty `prefix`
+        is already valid.
+
+        Generators extend valid sequences one item at a time, overriding this
+        lets a rule check only the appended item against the prefix instead of
+        the whole sequence. Defaults to `is_valid` on the extended sequence.
+
+        Parameters
+        ----------
+        `prefix` : T
+            The already validated sequence.
+        `item` : E
+            The item appended to `prefix`.
+
+        Returns
+        ----------
+        bool
+            True if the extended sequence is valid.
+        """
+
+        return self.is_valid([*prefix, item])  # type: ignore[list-item]
+
+    def is_valid_extension_batch(
+        self, prefix: T, batch: ExtensionBatch
+    ) -> np.ndarray | None:
+        """
+        Validates many extensions of the same valid `prefix` at once.
+
+        Rules that only compare counts and times can answer from the columns
+        of `batch` in a single NumPy operation. Defaults to
+        `is_valid_join_batch`, and to calling `is_valid_extension` for each
+        candidate if that is None.
+
+        Parameters
+        ----------
+        `prefix` : T
+            The already validated sequence.
+        `batch` : ExtensionBatch
+            The candidates appended to `prefix`.
+
+        Returns
+        ----------
+        np.ndarray | None
+            A boolean mask of the valid extensions, or None if the rule has no
+            batch form.
+        """
+
+        return self.is_valid_join_batch(batch)
+
+    def is_valid_join_batch(self, batch: ExtensionBatch) -> np.ndarray | None:
+        """
+        Validates extensions of many valid prefixes at once, each candidate of
+        `batch` appended to its own prefix.
+
+        Only the columns of `batch` are known, with the prefix fields given per
+        candidate. Rules that compare nothing else answer both this and
+        `is_valid_extension_batch`. Defaults to None, in which case
+        `is_valid_extension` is called for each candidate with its prefix.
+
+        Parameters
+        ----------
+        `batch` : ExtensionBatch
+            The candidates and the columns of their prefixes.
+
+        Returns
+        ----------
+        np.ndarray | None
+            A boolean mask of the valid extensions, or None if the rule has no
+            join form.
+        """
+
+        return None
+
+    def extension_bounds(self) -> ExtensionBounds:
+        """
+        Returns the limits that every valid sequence keeps.
+
+        A rule implied by its bounds lets the generators skip the candidates it
+        would reject without checking them. The bounds must not exclude any
+        valid sequence, the rule is still checked on the candidates within.
+        Defaults to no limits.
+
+        Returns
+        ----------
+        ExtensionBounds
+            The limits of the rule.
+        """
+
+        return ExtensionBounds()
+
 
-class ACPDutyRule(ACPRule[typing.Sequence[Leg]]):
+class ACPDutyRule(ACPRule[typing.Sequence[Leg], Leg]):
     pass
 
 
-class ACPPairingRule(ACPRule[typing.Sequence[Duty]]):
+class ACPPairingRule(ACPRule[typing.Sequence[Duty], Duty]):
     pass
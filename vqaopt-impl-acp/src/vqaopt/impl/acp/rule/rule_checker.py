@@ -2,10 +2,28 @@
 This module contains the rule checker for pairing and duty validation.
 """
 
+import time
 import typing
 
+import numpy as np
+
 from ..data_model import Duty, Leg
-from .rule import ACPDutyRule, ACPPairingRule
+from ..utils import instrumentation
+from .rule import ACPDutyRule, ACPPairingRule, ACPRule, ExtensionBatch
+from .rule_order import AdaptiveRuleOrder
+
+R = typing.TypeVar("R")
+
+
+def _all_valid(rules: typing.Iterable[R], check: typing.Callable[[R], bool]) -> bool:
+    # Counts and times the checks of each rule while instrumentation records,
+    # in the same order as without.
+    recorder = instrumentation.current()
+    if recorder is not None:
+        check = recorder.counted(check)
+    if isinstance(rules, AdaptiveRuleOrder):
+        return rules.all_valid(check)
+    return all(map(check, rules))
 
 
 def is_valid_duty(
@@ -25,7 +43,31 @@ def is_valid_duty(
         True if the duty is valid.
     """
 
-    return all(map(lambda rule: rule.is_valid(legs), duty_rules))
+    return _all_valid(duty_rules, lambda rule: rule.is_valid(legs))
+
+
+def is_valid_duty_extension(
+    legs: typing.Sequence[Leg],
+    leg: Leg,
+    duty_rules: typing.Sequence[ACPDutyRule],
+) -> bool:
+    """
+    Validates a duty extended by a leg, given that the duty itself is valid.
+
+    Parameters
+    ----------
+    `legs` : Sequence[Leg]
+        The legs of the already validated duty.
+    `leg` : Leg
+        The leg to append.
+
+    Returns
+    ----------
+    bool
+        True if the extended duty is valid.
+    """
+
+    return _all_valid(duty_rules, lambda rule: rule.is_valid_extension(legs, leg))
 
 
 def is_valid_pairing(
@@ -45,4 +87,172 @@ def is_valid_pairing(
         True if the pairing is valid.
     """
 
-    return all(map(lambda rule: rule.is_valid(duties), pairing_rules))
+    return _all_valid(pairing_rules, lambda rule: rule.is_valid(duties))
+
+
+def is_valid_pairing_extension(
+    duties: typing.Sequence[Duty],
+    duty: Duty,
+    pairing_rules: typing.Sequence[ACPPairingRule],
+) -> bool:
+    """
+    Validates a pairing extended by a duty, given that the pairing itself
+    is valid.
+
+    Parameters
+    ----------
+    `duties` : Sequence[Duty]
+        The duties of the already validated pairing.
+    `duty` : Duty
+        The duty to append.
+
+    Returns
+    ----------
+    bool
+        True if the extended pairing is valid.
+    """
+
+    return _all_valid(pairing_rules, lambda rule: rule.is_valid_extension(duties, duty))
+
+
+def valid_duty_extensions(
+    legs: typing.Sequence[Leg],
+    batch: ExtensionBatch,
+    candidate: typing.Callable[[int], Leg],
+    duty_rules: typing.Sequence[ACPDutyRule],
+) -> np.ndarray:
+    """
+    Validates a duty extended by each of many legs, given that the duty
+    itself is valid.
+
+    Parameters
+    ----------
+    `legs` : Sequence[Leg]
+        The legs of the already validated duty.
+    `batch` : ExtensionBatch
+        The times of the candidate legs.
+    `candidate` : Callable[[int], Leg]
+        Returns the candidate leg at a position of `batch`, for the rules
+        without a batch form.
+
+    Returns
+    ----------
+    np.ndarray
+        A boolean mask of the valid extensions.
+    """
+
+    return _valid_extensions(
+        batch,
+        lambda rule: rule.is_valid_extension_batch(legs, batch),
+        lambda _: legs,
+        candidate,
+        duty_rules,
+    )
+
+
+def valid_pairing_extensions(
+    duties: typing.Sequence[Duty],
+    batch: ExtensionBatch,
+    candidate: typing.Callable[[int], Duty],
+    pairing_rules: typing.Sequence[ACPPairingRule],
+) -> np.ndarray:
+    """
+    Validates a pairing extended by each of many duties, given that the
+    pairing itself is valid.
+
+    Parameters
+    ----------
+    `duties` : Sequence[Duty]
+        The duties of the already validated pairing.
+    `batch` : ExtensionBatch
+        The times of the candidate duties.
+    `candidate` : Callable[[int], Duty]
+        Returns the candidate duty at a position of `batch`, for the rules
+        without a batch form.
+
+    Returns
+    ----------
+    np.ndarray
+        A boolean mask of the valid extensions.
+    """
+
+    return _valid_extensions(
+        batch,
+        lambda rule: rule.is_valid_extension_batch(duties, batch),
+        lambda _: duties,
+        candidate,
+        pairing_rules,
+    )
+
+
+def valid_pairing_joins(
+    batch: ExtensionBatch,
+    prefix: typing.Callable[[int], typing.Sequence[Duty]],
+    candidate: typing.Callable[[int], Duty],
+    pairing_rules: typing.Sequence[ACPPairingRule],
+) -> np.ndarray:
+    """
+    Validates many pairings, each extended by a duty, given that the pairings
+    themselves are valid.
+
+    Parameters
+    ----------
+    `batch` : ExtensionBatch
+        The times of the candidate duties and of the pairings they extend.
+    `prefix` : Callable[[int], Sequence[Duty]]
+        Returns the duties of the pairing extended at a position of `batch`,
+        for the rules without a join form.
+    `candidate` : Callable[[int], Duty]
+        Returns the candidate duty at a position of `batch`.
+
+    Returns
+    ----------
+    np.ndarray
+        A boolean mask of the valid extensions.
+    """
+
+    return _valid_extensions(
+        batch,
+        lambda rule: rule.is_valid_join_batch(batch),
+        prefix,
+        candidate,
+        pairing_rules,
+    )
+
+
+def _valid_extensions(
+    batch: ExtensionBatch,
+    batch_form: typing.Callable[[ACPRule], np.ndarray | None],
+    prefix: typing.Callable[[int], typing.Sequence[typing.Any]],
+    candidate: typing.Callable[[int], typing.Any],
+    rules: typing.Iterable[ACPRule],
+) -> np.ndarray:
+    # Applies the batch forms first, then checks the candidates still valid
+    # one by one with the rules that have none.
+    recorder = instrumentation.current()
+    valid = np.ones(len(batch), dtype=bool)
+    fallback = []
+    for rule in rules:
+        start = time.perf_counter()
+        mask = batch_form(rule)
+        if mask is None:
+            fallback.append(rule)
+            continue
+        if recorder is not None:
+            rejected = int(np.count_nonzero(valid & ~mask))
+            recorder.count_rule(
+                rule,
+                int(np.count_nonzero(valid)),
+                rejected,
+                time.perf_counter() - start,
+            )
+        valid &= mask
+
+    if fallback:
+        for index in np.flatnonzero(valid).tolist():
+            items = prefix(index)
+            item = candidate(index)
+            valid[index] = _all_valid(
+                fallback, lambda rule: rule.is_valid_extension(items, item)
+            )
+    return valid
@@ -0,0 +1,121 @@
+"""
+Adaptive evaluation order of rules.
+"""
+
+import time
+import typing
+
+R = typing.TypeVar("R")
+
+
+def _rule_key(rule: typing.Any) -> tuple[str, str]:
+    # Rules are plugins, their class and settings identify them.
+    return type(rule).__qualname__, rule.model_dump_json()
+
+
+class AdaptiveRuleOrder(typing.Sequence[R]):
+    """
+    A set of rules checked in the order of the least expected work.
+
+    The rules start out sorted by class name and settings, independent of the
+    iteration order of the set they come from. Every check counts the
+    rejections of the rules evaluated, and every `sample`-th check also times
+    them. Every `period` checks the rules are sorted by their mean time divided
+    by their rejection rate, so cheap rules that reject often run first.
+
+    A check passes if all rules accept, which does not depend on the order as
+    long as the rules have no side effects: the order only changes how soon a
+    rejection is found.
+    """
+
+    def __init__(
+        self, rules: typing.Iterable[R], period: int = 1024, sample: int = 16
+    ) -> None:
+        """
+        Parameters
+        ----------
+        `rules` : Iterable[R]
+            The rules to check
+        `period` : int, defaults to 1024
+            The number of checks between reorderings
+        `sample` : int, defaults to 16
+            Every `sample`-th check is timed
+        """
+
+        self._rules = sorted(rules, key=_rule_key)
+        self._order = list(range(len(self._rules)))
+        self._checks = [0] * len(self._rules)
+        self._rejections = [0] * len(self._rules)
+        self._timed = [0] * len(self._rules)
+        self._time = [0.0] * len(self._rules)
+        self._period = period
+        self._sample = sample
+        self._calls = 0
+
+    @classmethod
+    def of(cls, rules: typing.Iterable[R]) -> "AdaptiveRuleOrder[R]":
+        """
+        Returns `rules` if it is already ordered adaptively, or a new order.
+        """
+
+        if isinstance(rules, AdaptiveRuleOrder):
+            return rules
+        return cls(rules)
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    @typing.overload
+    def __getitem__(self, index: int) -> R: ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> list[R]: ...
+
+    def __getitem__(self, index: int | slice) -> R | list[R]:
+        """
+        Returns the rules in their current order.
+        """
+
+        if isinstance(index, slice):
+            return [self._rules[i] for i in self._order[index]]
+        return self._rules[self._order[index]]
+
+    def all_valid(self, check: typing.Callable[[R], bool]) -> bool:
+        """
+        Returns whether `check` holds for all rules, like `all`.
+        """
+
+        self._calls += 1
+        if self._calls % self._period == 0:
+            self._reorder()
+        if self._calls % self._sample == 0:
+            return self._all_valid_timed(check)
+
+        for index in self._order:
+            self._checks[index] += 1
+            if not check(self._rules[index]):
+                self._rejections[index] += 1
+                return False
+        return True
+
+    def _all_valid_timed(self, check: typing.Callable[[R], bool]) -> bool:
+        for index in self._order:
+            start = time.perf_counter()
+            valid = check(self._rules[index])
+            self._time[index] += time.perf_counter() - start
+            self._timed[index] += 1
+            self._checks[index] += 1
+            if not valid:
+                self._rejections[index] += 1
+                return False
+        return True
+
+    def _reorder(self) -> None:
+        def expected_work(index: int) -> float:
+            # Smoothed, so that rules without rejections yet still compare by
+            # their cost.
+            rate = (self._rejections[index] + 1) / (self._checks[index] + 2)
+            cost = self._time[index] / self._timed[index] if self._timed[index] else 0
+            return cost / rate
+
+        self._order.sort(key=expected_work)
@@ -3,13 +3,17 @@ This module contains the rules for pairing and duty validation.
 """
 
 import itertools
+import math
 import typing
 from datetime import timedelta
 
+import numpy as np
+
 from vqaopt.core.plugin import Field
 
 from ..data_model import Duty, Leg
-from .rule import ACPDutyRule, ACPPairingRule
+from ..data_model.leg_table import MINUTES_PER_DAY
+from .rule import ACPDutyRule, ACPPairingRule, ExtensionBatch, ExtensionBounds
 
 
 class MaxFlights(ACPDutyRule):
@@ -27,6 +31,15 @@ class MaxFlights(ACPDutyRule):
     def is_valid(self, to_validate: typing.Sequence[Leg]) -> bool:
         return len(to_validate) <= self.threshold
 
+    def is_valid_extension(self, prefix: typing.Sequence[Leg], item: Leg) -> bool:
+        return len(prefix) + 1 <= self.threshold
+
+    def is_valid_join_batch(self, batch: ExtensionBatch) -> np.ndarray:
+        return np.full(len(batch), batch.prefix_length + 1 <= self.threshold)
+
+    def extension_bounds(self) -> ExtensionBounds:
+        return ExtensionBounds(max_count=self.threshold)
+
 
 class MinConnect(ACPDutyRule):
     threshold: int = Field(
@@ -46,6 +59,16 @@ class MinConnect(ACPDutyRule):
                 return False
         return True
 
+    def is_valid_extension(self, prefix: typing.Sequence[Leg], item: Leg) -> bool:
+        connection_time = item.departure_datetime - prefix[-1].arrival_datetime
+        return connection_time >= timedelta(minutes=self.threshold)
+
+    def is_valid_join_batch(self, batch: ExtensionBatch) -> np.ndarray:
+        return batch.departures - batch.prefix_end >= self.threshold
+
+    def extension_bounds(self) -> ExtensionBounds:
+        return ExtensionBounds(min_gap=self.threshold)
+
 
 class MaxDurationDutyTime(ACPDutyRule):
 
@@ -64,6 +87,17 @@ class MaxDurationDutyTime(ACPDutyRule):
             to_validate[-1].arrival_datetime - to_validate[0].departure_datetime
         ) <= timedelta(hours=self.threshold)
 
+    def is_valid_extension(self, prefix: typing.Sequence[Leg], item: Leg) -> bool:
+        return (item.arrival_datetime - prefix[0].departure_datetime) <= timedelta(
+            hours=self.threshold
+        )
+
+    def is_valid_join_batch(self, batch: ExtensionBatch) -> np.ndarray:
+        return batch.arrivals - batch.prefix_start <= self.threshold * 60
+
+    def extension_bounds(self) -> ExtensionBounds:
+        return ExtensionBounds(max_elapsed=self.threshold * 60)
+
 
 class MaxDuties(ACPPairingRule):
 
@@ -80,6 +114,15 @@ class MaxDuties(ACPPairingRule):
     def is_valid(self, to_validate: typing.Sequence[Duty]) -> bool:
         return len(to_validate) <= self.threshold
 
+    def is_valid_extension(self, prefix: typing.Sequence[Duty], item: Duty) -> bool:
+        return len(prefix) + 1 <= self.threshold
+
+    def is_valid_join_batch(self, batch: ExtensionBatch) -> np.ndarray:
+        return np.full(len(batch), batch.prefix_length + 1 <= self.threshold)
+
+    def extension_bounds(self) -> ExtensionBounds:
+        return ExtensionBounds(max_count=self.threshold)
+
 
 class MinRest(ACPPairingRule):
 
@@ -101,6 +144,24 @@ class MinRest(ACPPairingRule):
             if rest < timedelta(hours=self.threshold):
                 return False
         return True
+
+    def is_valid_extension(self, prefix: typing.Sequence[Duty], item: Duty) -> bool:
+        rest = item.legs[0].departure_datetime - prefix[-1].legs[-1].arrival_datetime
+        return rest >= timedelta(hours=self.threshold)
+
+    def is_valid_join_batch(self, batch: ExtensionBatch) -> np.ndarray:
+        return batch.departures - batch.prefix_end >= self._min_minutes()
+
+    def extension_bounds(self) -> ExtensionBounds:
+        return ExtensionBounds(min_gap=self._min_minutes())
+
+    def _min_minutes(self) -> int:
+        # Times are whole minutes, so a rest shorter than the threshold by a
+        # fraction of a minute is one minute too short. Rounded like the
+        # timedelta of `is_valid_extension`, not the float threshold.
+        return math.ceil(timedelta(hours=self.threshold) / timedelta(minutes=1))
+
+
 class MaxPairingDuration(ACPPairingRule):
 
     threshold: int = Field(
@@ -115,3 +176,15 @@ class MaxPairingDuration(ACPPairingRule):
 
     def is_valid(self, to_validate: typing.Sequence[Duty]) -> bool:
         return (to_validate[-1].day - to_validate[0].day).days <= self.threshold
+
+    def is_valid_extension(self, prefix: typing.Sequence[Duty], item: Duty) -> bool:
+        return (item.day - prefix[0].day).days <= self.threshold
+
+    def is_valid_join_batch(self, batch: ExtensionBatch) -> np.ndarray:
+        return (
+            batch.departures // MINUTES_PER_DAY - batch.prefix_start // MINUTES_PER_DAY
+            <= self.threshold
+        )
+
+    def extension_bounds(self) -> ExtensionBounds:
+        return ExtensionBounds(max_days=self.threshold)
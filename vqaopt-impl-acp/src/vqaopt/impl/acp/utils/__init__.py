@@ -1,3 +1,13 @@
-from .reader import load_legs_from_file
+from .cache import ArrayCache, digest, file_digest
+from .instrumentation import Instrumentation
+from .reader import load_leg_table, load_legs_from_file, read_legs_from_file
 
-__all__ = ["load_legs_from_file"]
+__all__ = [
+    "ArrayCache",
+    "digest",
+    "file_digest",
+    "Instrumentation",
+    "load_leg_table",
+    "load_legs_from_file",
+    "read_legs_from_file",
+]
@@ -0,0 +1,144 @@
+"""
+Content-addressed on-disk cache of NumPy arrays.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import typing
+from pathlib import Path
+
+import numpy as np
+
+_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path: str | Path) -> str:
+    """
+    Returns the SHA-256 hex digest of the contents of a file.
+    """
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def digest(*parts: typing.Any) -> str:
+    """
+    Returns the SHA-256 hex digest of JSON serializable parts.
+    """
+
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+
+class ArrayCache:
+    """
+    A directory of cache entries, each a named set of NumPy arrays.
+
+    Entries are addressed by a key, usually a `digest` of everything the arrays
+    were computed from. Every entry is a subdirectory holding one `.npy` file
+    per array, written to a temporary directory first and renamed into place,
+    so readers never see partial entries. Arrays are loaded memory-mapped.
+
+    The cache is bounded by the total size of its files. Loading an entry marks
+    it as recently used, storing an entry evicts the least recently used ones
+    until the cache fits again.
+    """
+
+    directory: Path
+    max_bytes: int
+
+    def __init__(self, directory: str | Path, max_bytes: int) -> None:
+        """
+        Parameters
+        ----------
+        `directory` : str | Path
+            The directory of the cache, created on the first store
+        `max_bytes` : int
+            The size limit of the cache in bytes
+        """
+
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def load(self, key: str) -> dict[str, np.ndarray] | None:
+        """
+        Returns the memory-mapped arrays of an entry, None if it is missing
+        or unreadable.
+        """
+
+        entry = self.directory / key
+        if not entry.is_dir():
+            return None
+
+        try:
+            arrays = {
+                path.stem: np.load(path, mmap_mode="r", allow_pickle=False)
+                for path in sorted(entry.glob("*.npy"))
+            }
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        return arrays
+
+    def store(self, key: str, arrays: typing.Mapping[str, np.ndarray]) -> None:
+        """
+        Stores arrays as an entry, then evicts entries if the cache is full.
+
+        An existing entry with the same key is kept as it is.
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.directory))
+        try:
+            for name, array in arrays.items():
+                np.save(staging / f"{name}.npy", np.ascontiguousarray(array))
+            os.replace(staging, self.directory / key)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not (self.directory / key).is_dir():
+                raise
+
+        self.evict(keep=key)
+
+    def evict(self, keep: str | None = None) -> None:
+        """
+        Removes the least recently used entries until the cache fits its limit.
+
+        Parameters
+        ----------
+        `keep` : str | None, defaults to None
+            The key of an entry never to remove
+        """
+
+        if not self.directory.is_dir():
+            return
+
+        entries = []
+        for entry in self.directory.iterdir():
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            size = sum(path.stat().st_size for path in entry.iterdir())
+            entries.append((entry.stat().st_mtime, entry.name, size))
+
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(self.directory / name, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        """
+        Removes all entries.
+        """
+
+        shutil.rmtree(self.directory, ignore_errors=True)
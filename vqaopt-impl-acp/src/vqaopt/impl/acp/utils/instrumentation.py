@@ -0,0 +1,165 @@
+"""
+Counters and timers of the generation of duties and pairings.
+"""
+
+import time
+import typing
+from contextlib import contextmanager
+
+
+class Instrumentation:
+    """
+    Counters and timers collected while recording, see `record`.
+
+    Fields
+    ----------
+    `stages` : dict[str, float]
+        The seconds spent in each stage
+    `rules` : dict[str, dict[str, float]]
+        The number of `checks` and `rejections` of each rule by `rule_name`,
+        and the seconds spent in them as `time`
+    `counters` : dict[str, int]
+        Event counts, like the expansions of partial duties and pairings and
+        the candidates examined for them
+    """
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+        self.rules: dict[str, dict[str, float]] = {}
+        self.counters: dict[str, int] = {}
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Adds `amount` to the counter `name`.
+        """
+
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def stage(self, name: str) -> typing.Iterator[None]:
+        """
+        Adds the time spent in the context to the stage `name`.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def counted(
+        self, check: typing.Callable[[typing.Any], bool]
+    ) -> typing.Callable[[typing.Any], bool]:
+        """
+        Returns `check` timing and counting each rule it is called with, for
+        the rules to be checked in their usual order.
+        """
+
+        def counted_check(rule: typing.Any) -> bool:
+            start = time.perf_counter()
+            valid = check(rule)
+            self.count_rule(rule, 1, 0 if valid else 1, time.perf_counter() - start)
+            return valid
+
+        return counted_check
+
+    def count_rule(
+        self, rule: typing.Any, checks: int, rejections: int, elapsed: float
+    ) -> None:
+        """
+        Adds checks, rejections and seconds to the stats of a rule.
+        """
+
+        name = rule_name(rule)
+        stats = self.rules.get(name)
+        if stats is None:
+            stats = self.rules[name] = {
+                "checks": 0,
+                "rejections": 0,
+                "time": 0.0,
+            }
+        stats["checks"] += checks
+        stats["rejections"] += rejections
+        stats["time"] += elapsed
+
+    def merge(self, other: dict[str, typing.Any]) -> None:
+        """
+        Adds the counters and timers of `to_dict` of another instance, e.g. of
+        a worker process.
+        """
+
+        for name, seconds in other["stages"].items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        for name, stats in other["rules"].items():
+            own = self.rules.setdefault(
+                name, {"checks": 0, "rejections": 0, "time": 0.0}
+            )
+            for key, value in stats.items():
+                own[key] += value
+        for name, amount in other["counters"].items():
+            self.count(name, amount)
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        """
+        Returns the counters and timers as a JSON serializable dict.
+        """
+
+        return {
+            "stages": dict(self.stages),
+            "rules": {name: dict(stats) for name, stats in self.rules.items()},
+            "counters": dict(self.counters),
+        }
+
+
+def rule_name(rule: typing.Any) -> str:
+    """
+    Returns the name of a rule in the stats, its class name and settings, so
+    that rules of the same class with different thresholds are kept apart.
+    """
+
+    settings = rule.model_dump_json() if hasattr(rule, "model_dump_json") else ""
+    return f"{type(rule).__name__}{settings}"
+
+
+_current: Instrumentation | None = None
+
+
+def current() -> Instrumentation | None:
+    """
+    Returns the instrumentation being recorded to, None if not recording.
+    """
+
+    return _current
+
+
+@contextmanager
+def record(
+    instrumentation: Instrumentation | None = None,
+) -> typing.Iterator[Instrumentation]:
+    """
+    Records the counters and timers of the generators and rule checks in the
+    context, to a new Instrumentation unless one is given.
+
+    Outside of the context the generators only check whether they are recorded.
+    """
+
+    global _current
+    previous = _current
+    _current = instrumentation if instrumentation is not None else Instrumentation()
+    try:
+        yield _current
+    finally:
+        _current = previous
+
+
+@contextmanager
+def stage(name: str) -> typing.Iterator[None]:
+    """
+    Times the context as the stage `name` if recording.
+    """
+
+    if _current is None:
+        yield
+        return
+    with _current.stage(name):
+        yield
@@ -1,7 +1,36 @@
 import csv
 import typing
+from datetime import datetime
 
-from ..data_model import Leg, LegContainer
+import numpy as np
+
+from ..data_model import Leg, LegContainer, LegTable
+from ..data_model.leg_table import to_minutes
+
+NUM_COLUMNS = 7
+
+
+def read_legs_from_file(
+    process_row: typing.Callable[[typing.Sequence[str]], Leg],
+    path: str,
+    reader_kwargs: dict[str, typing.Any] | None = None,
+    skip_header: bool = True,
+) -> list[Leg]:
+    """
+    Reads the csv at `path` into a list of legs in file order,
+    see `load_legs_from_file` for the parameters.
+    """
+
+    with open(path, "r", encoding="utf-8") as f:
+        if reader_kwargs is None:
+            reader = csv.reader(f)
+        else:
+            reader = csv.reader(f, **reader_kwargs)
+
+        if skip_header:
+            next(reader, None)
+
+        return [process_row(row) for row in reader]
 
 
 def load_legs_from_file(
@@ -35,17 +64,107 @@ def load_legs_from_file(
     - Arrival Time (%H:%M)
     """
 
-    with open(path, "r", encoding="utf-8") as f:
-        if reader_kwargs is None:
-            reader = csv.reader(f)
-        else:
-            reader = csv.reader(f, **reader_kwargs)
-
-        if skip_header:
-            next(reader, None)
-
-        legs: list[Leg] = [process_row(row) for row in reader]
+    legs = read_legs_from_file(process_row, path, reader_kwargs, skip_header)
 
     container = LegContainer(legs)
 
     return container
+
+
+def _parse_unique(
+    values: typing.Sequence[str], parse: typing.Callable[[str], int]
+) -> np.ndarray:
+    # Dates and times repeat across rows, each distinct string is parsed once.
+    unique, inverse = np.unique(np.asarray(values, dtype=np.str_), return_inverse=True)
+    parsed = np.fromiter(
+        (parse(value) for value in unique.tolist()), dtype=np.int64, count=len(unique)
+    )
+    return parsed[inverse]
+
+
+def _parse_date(value: str) -> int:
+    return to_minutes(datetime.strptime(value, "%Y-%m-%d"))
+
+
+def _parse_time(value: str) -> int:
+    moment = datetime.strptime(value, "%H:%M")
+    return moment.hour * 60 + moment.minute
+
+
+def load_leg_table(
+    paths: typing.Iterable[str],
+    delimiter: str = ",",
+    skip_header: bool = True,
+) -> LegTable:
+    """
+    Loads the csv files at `paths` into a single LegTable.
+
+    Reads every file at once and parses the columns in bulk, sorting the legs
+    only once for all files. Expects the columns of the default row processing
+    of `load_legs_from_file` and plain fields without quoting; other formats
+    should be read with `load_legs_from_file` and a custom row processor.
+    Blank lines are skipped.
+
+    Parameters
+    ----------
+    `paths` : Iterable[str]
+        The paths to the csv files
+    `delimiter` : str, defaults to ","
+        The field delimiter
+    `skip_header` : bool, defaults to True
+        If True, skips the first line of each file.
+
+    Raises
+    ----------
+    ValueError
+        If a row does not have exactly seven fields or contains an invalid
+        date or time.
+    """
+
+    rows: list[list[str]] = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        for number, line in enumerate(lines[1:] if skip_header else lines):
+            if not line.strip():
+                continue
+            fields = line.split(delimiter)
+            if len(fields) != NUM_COLUMNS:
+                raise ValueError(
+                    f"{path}:{number + 1 + skip_header}: expected {NUM_COLUMNS} "
+                    f"fields, found {len(fields)}"
+                )
+            rows.append(fields)
+
+    if not rows:
+        columns: list[list[str]] = [[] for _ in range(NUM_COLUMNS)]
+    else:
+        columns = [[field.strip() for field in column] for column in zip(*rows)]
+    (
+        flight_designator,
+        departure_airport,
+        departure_date,
+        departure_hour,
+        arrival_airport,
+        arrival_date,
+        arrival_hour,
+    ) = columns
+
+    is_home_base = {
+        code: code.lower().startswith("base") for code in set(departure_airport)
+    }
+    return LegTable.from_columns(
+        departure_airport,
+        _parse_unique(departure_date, _parse_date)
+        + _parse_unique(departure_hour, _parse_time),
+        arrival_airport,
+        _parse_unique(arrival_date, _parse_date)
+        + _parse_unique(arrival_hour, _parse_time),
+        flight_designator,
+        np.fromiter(
+            (is_home_base[code] for code in departure_airport),
+            dtype=np.bool_,
+            count=len(departure_airport),
+        ),
+    )
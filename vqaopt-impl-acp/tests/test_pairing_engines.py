@@ -0,0 +1,145 @@
+"""
+Equivalence of the pairing engines on a bundled instance, and the departure
+windows of LegContainer.
+"""
+
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from vqaopt.impl.acp.cost_model import ACPCostExample
+from vqaopt.impl.acp.data_model import DutyGraph, Leg, LegContainer
+from vqaopt.impl.acp.data_model.duty_generation import DutyGenerator
+from vqaopt.impl.acp.data_model.pairing_bidirectional import BidirectionalGenerator
+from vqaopt.impl.acp.data_model.pairing_generation import PairingGenerator
+from vqaopt.impl.acp.data_model.pairing_join import JoinGenerator
+from vqaopt.impl.acp.loader import LoadACP
+from vqaopt.impl.acp.rule import rules
+
+INPUT_DIR = Path(__file__).parents[2]
+
+PAIRING_RULES = {rules.MaxDuties(), rules.MinRest(), rules.MaxPairingDuration()}
+
+
+def _graph(days: int) -> DutyGraph:
+    loader = LoadACP(
+        input_dir_location=str(INPUT_DIR),
+        instance="instance_1",
+        days=days,
+        cache=False,
+        cost_model=ACPCostExample(),
+        duty_rules={
+            rules.MaxFlights(),
+            rules.MinConnect(),
+            rules.MaxDurationDutyTime(),
+        },
+        pairing_rules=PAIRING_RULES,
+    )
+    legs = loader.load_raw_data()
+    return DutyGraph(DutyGenerator.generate_full_period(legs, loader.duty_rules))
+
+
+@pytest.fixture(scope="module")
+def graph() -> DutyGraph:
+    return _graph(3)
+
+
+@pytest.fixture(scope="module")
+def enumerated(graph: DutyGraph) -> list[list[int]]:
+    return list(PairingGenerator.iter_paths(graph, PAIRING_RULES))
+
+
+def test_enumeration_is_not_empty(enumerated: list[list[int]]) -> None:
+    assert any(len(path) > 1 for path in enumerated)
+    assert len({tuple(path) for path in enumerated}) == len(enumerated)
+
+
+def test_join_generates_the_enumerated_pairings(
+    graph: DutyGraph, enumerated: list[list[int]]
+) -> None:
+    joined = list(JoinGenerator.iter_paths(graph, PAIRING_RULES))
+
+    assert len(joined) == len(enumerated)
+    assert {tuple(path) for path in joined} == {tuple(path) for path in enumerated}
+
+
+@pytest.mark.parametrize("max_duties", [2, 3, 5])
+def test_bidirectional_generates_the_enumerated_pairings(
+    graph: DutyGraph, max_duties: int
+) -> None:
+    pairing_rules = {
+        rules.MaxDuties(threshold=max_duties),
+        rules.MinRest(),
+        rules.MaxPairingDuration(),
+    }
+    enumerated = list(PairingGenerator.iter_paths(graph, pairing_rules))
+    joined = list(BidirectionalGenerator.iter_paths(graph, pairing_rules))
+
+    assert len(joined) == len(enumerated)
+    assert {tuple(path) for path in joined} == {tuple(path) for path in enumerated}
+
+
+def test_bidirectional_joins_halves_of_several_duties() -> None:
+    graph = _graph(4)
+    pairing_rules = {rules.MaxDuties(threshold=4), rules.MinRest()}
+    expected = list(JoinGenerator.iter_paths(graph, pairing_rules))
+    joined = list(BidirectionalGenerator.iter_paths(graph, pairing_rules))
+
+    assert any(len(path) == 4 for path in joined)
+    assert len(joined) == len(expected)
+    assert {tuple(path) for path in joined} == {tuple(path) for path in expected}
+
+
+def test_parallel_enumeration_keeps_the_order(
+    graph: DutyGraph, enumerated: list[list[int]]
+) -> None:
+    assert list(PairingGenerator.iter_paths(graph, PAIRING_RULES, 2)) == enumerated
+    assert PairingGenerator.generate_paths(graph, PAIRING_RULES, 2) == enumerated
+
+
+def _at(hour: int) -> datetime:
+    return datetime(2024, 1, 1, hour)
+
+
+@pytest.fixture
+def legs() -> LegContainer:
+    return LegContainer(
+        [
+            Leg("BASE1", _at(8), "AAA", _at(9), "F1", True),
+            Leg("BASE1", _at(10), "AAA", _at(11), "F2", True),
+            Leg("AAA", _at(12), "BASE1", _at(13), "F3", False),
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    ("earliest", "latest", "inclusive", "expected"),
+    [
+        (None, None, (True, True), ["F1", "F2"]),
+        (_at(7), None, (False, True), ["F1", "F2"]),
+        (_at(6), _at(7), (True, True), []),
+        (None, _at(7), (True, True), []),
+        (_at(8), None, (True, True), ["F1", "F2"]),
+        (_at(8), None, (False, True), ["F2"]),
+        (None, _at(8), (True, True), ["F1"]),
+        (None, _at(8), (True, False), []),
+        (_at(8), _at(10), (False, False), []),
+        (_at(9), _at(23), (True, True), ["F2"]),
+        (_at(11), None, (True, True), []),
+    ],
+)
+def test_departure_windows(
+    legs: LegContainer,
+    earliest: datetime | None,
+    latest: datetime | None,
+    inclusive: tuple[bool, bool],
+    expected: list[str],
+) -> None:
+    departures = legs.departures("BASE1", earliest, latest, inclusive)
+
+    assert [leg.flight_designator for leg in departures] == expected
+
+
+def test_departures_from_unknown_airport(legs: LegContainer) -> None:
+    assert legs.departures("CCC") == []